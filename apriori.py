@@ -8,86 +8,187 @@
 __copyright__ = 'Copyright © 2022 ERSSLE'
 __license__ = 'MIT License'
 
+import time
+from collections import defaultdict
+
 import numpy as np
+
+from codec import encode_transactions
+from instrument import add_time,phase
+
 def gen_items(transactions):
-    """获取唯一的项数目与数据条目数量"""
-    items = []
-    for i,transaction in enumerate(transactions):
-        for item in transaction:
-            if item not in items:
-                items.append(item)
-    return items,i+1
+    """获取唯一的项(按出现次数降序排列)与数据条目数量"""
+    codec,data = encode_transactions(transactions)
+    return codec.items,len(data)
 
-def gen_matrix(transactions,mode='general'):
-    """通过购物篮类数据创建np.array"""
-    items,length = gen_items(transactions)
-    matrix = np.zeros((length,len(items)))
-    for row_idx,transaction in enumerate(transactions):
-        for item in transaction:
-            col_idx = items.index(item)
-            if mode == 'general':
-                matrix[row_idx,col_idx] = 1
-            elif mode == 'mini':
-                matrix[row_idx,col_idx] += 1
-    if mode == 'mini':
-        return matrix / matrix.sum(0),np.asarray(items)
-    elif mode == 'general':
-        return matrix,np.asarray(items)
+def gen_matrix(transactions,mode='general',stats=None):
+    """
+    通过购物篮类数据创建np.array，列下标即项的编码id
+    stats: 可选的统计字典(见instrument)，记录count,encode与build(创建矩阵)阶段的耗时
+    """
+    codec,data = encode_transactions(transactions,stats)
+    with phase(stats,'build'):
+        matrix = np.zeros((len(data),len(codec)))
+        rows = data.rows()
+        if mode == 'general':
+            matrix[rows,data.items] = 1
+        elif mode == 'mini':
+            np.add.at(matrix,(rows,data.items),1)
+        if mode == 'mini':
+            matrix = matrix / matrix.sum(0)
+    return matrix,codec.items_array()
 
-def find_frequent_itemsets(transactions,minimum_support,mode='general'):
+def gen_columns(transactions,stats=None):
+    """
+    mini模式下按列稀疏存储归一化后的数据：每一项只保存其出现的数据条目行号与该行的归一化值，
+    列下标即项的编码id，第j列为rows[offsets[j]:offsets[j+1]](升序)与values[offsets[j]:offsets[j+1]]
+    stats: 可选的统计字典(见instrument)，记录count,encode与build(创建稀疏列)阶段的耗时
+    返回: (offsets,rows,values,items)
+    """
+    codec,data = encode_transactions(transactions,stats)
+    with phase(stats,'build'):
+        length = max(len(data),1)
+        # 同一条数据中重复出现的项累加计数，与gen_matrix的mini模式一致
+        keys,cnts = np.unique(data.items.astype(np.int64) * length + data.rows(),return_counts=True)
+        cols = keys // length
+        rows = keys % length
+        totals = np.bincount(cols,weights=cnts,minlength=len(codec))
+        values = cnts / totals[cols]
+        offsets = np.zeros(len(codec)+1,dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(cols,minlength=len(codec)))
+    return offsets,rows,values,codec.items_array()
+
+def find_mini_itemsets(transactions,minimum_support,stats=None):
+    """
+    mini-apriori：项集的支持度为其各项归一化值在每一行上的最小值之和，只在项集所有项都出现的行上非零。
+    每个频繁项集保存其出现的行号与行上的最小值，候选项集(前缀+(a,b))的行集由父项集(前缀+(a,))的行集
+    与b列相交得到；同一父项集的所有候选在一次searchsorted中与父项集的行集相交
+    参数与返回结果同find_frequent_itemsets
+    """
+    offsets,col_rows,col_values,items = gen_columns(transactions,stats)
+    start = time.perf_counter()
+    if stats is not None:
+        stats.setdefault('candidates',[])
+        stats.setdefault('pruned',[])
+        stats.setdefault('frequent',[])
+
+    # 长度为1的项集不作筛选，每一列的归一化值之和均为1
+    level = dict(((idx,),(col_rows[offsets[idx]:offsets[idx+1]],col_values[offsets[idx]:offsets[idx+1]]))\
+                 for idx in range(len(items)))
+    frequent_items = [((idx,),int(round(col_values[offsets[idx]:offsets[idx+1]].sum()))) for idx in range(len(items))]
+    while level:
+        candidates,generated,pruned = gen_candidates(list(level))
+        if stats is not None:
+            stats['candidates'].append(generated)
+            stats['pruned'].append(pruned)
+        by_parent = defaultdict(list)
+        for candidate in candidates:
+            by_parent[candidate[:-1]].append(candidate[-1])
+        next_level = {}
+        for parent,lasts in by_parent.items():
+            parent_rows,parent_values = level[parent]
+            if len(parent_rows) == 0:
+                continue
+            # 将所有候选的新列拼接在一起，一次完成与父项集行集的相交
+            lengths = offsets[np.asarray(lasts)+1] - offsets[np.asarray(lasts)]
+            rows = np.concatenate([col_rows[offsets[j]:offsets[j+1]] for j in lasts])
+            values = np.concatenate([col_values[offsets[j]:offsets[j+1]] for j in lasts])
+            labels = np.repeat(np.arange(len(lasts)),lengths)
+            pos = np.searchsorted(parent_rows,rows)
+            pos[pos == len(parent_rows)] = 0
+            hit = parent_rows[pos] == rows
+            rows,labels = rows[hit],labels[hit]
+            values = np.minimum(values[hit],parent_values[pos[hit]])
+            sups = np.bincount(labels,weights=values,minlength=len(lasts))
+            bounds = np.searchsorted(labels,np.arange(len(lasts)+1))
+            # 归一化值之和存在浮点误差，恰好等于支持度的项集以isclose判断
+            for k in np.flatnonzero((sups >= minimum_support) | np.isclose(sups,minimum_support)):
+                candidate = parent + (lasts[k],)
+                next_level[candidate] = (rows[bounds[k]:bounds[k+1]],values[bounds[k]:bounds[k+1]])
+                frequent_items.append((candidate,sups[k]))
+        if stats is not None:
+            stats['frequent'].append(len(next_level))
+        level = next_level
+    add_time(stats,'mine',time.perf_counter() - start)
+    return [([items[idx] for idx in fi[0]],fi[1]) for fi in frequent_items]
+
+def gen_candidates(frequent_items_k_1):
+    """
+    新长度下候选项集的产生基于Fk-1 x Fk-1策略，详细可以查看《数据挖掘导论(完整版)》Pang-Ning Tan,
+    Michael Steinbach, Vipin Kunmar著 6.2.3小节
+    上一轮频繁项集按前缀(除最后一项外的部分)分组，只有同组的项集才进行合并，
+    合并后的候选项集若存在非频繁的(k-1)子集则直接剪枝，不再计算支持度
+    frequent_items_k_1: 上一轮频繁项集，每一项为升序排列的列下标tuple
+    返回: (候选项集列表,合并产生的候选数,剪枝数)
+    """
+    groups = defaultdict(list)
+    for itemset in frequent_items_k_1:
+        groups[itemset[:-1]].append(itemset[-1])
+    frequent_set = set(frequent_items_k_1)
+    candidates = []
+    generated,pruned = 0,0
+    for prefix,lasts in groups.items():
+        lasts.sort()
+        for i in range(len(lasts)-1):
+            for j in range(i+1,len(lasts)):
+                candidate = prefix + (lasts[i],lasts[j])
+                generated += 1
+                # 去掉最后两项之一得到的子集即为合并的两个父项集，只需检查去掉前缀中某一项的子集
+                if all(candidate[:k] + candidate[k+1:] in frequent_set for k in range(len(prefix))):
+                    candidates.append(candidate)
+                else:
+                    pruned += 1
+    return candidates,generated,pruned
+
+def find_frequent_itemsets(transactions,minimum_support,mode='general',stats=None):
     """
     基于给定的支持度，查找频繁项集
     transactions: 类双层python链表，每一项元素代表一条数据
     minimum_support: 支持度
     model: general or mini,general为普通的apriori,mini指mini-apriori
     mini-apriori不关心项出现的绝对频率是否足够，只关心项之间关联的强度,mini模式下,minimum_support的值应该在0-1
+    stats: 可选的字典或instrument.MiningStats，用于记录每一轮(从长度2开始)产生的候选项集数'candidates'、
+           剪枝数'pruned'与频繁项集数'frequent'，以及各阶段的耗时'time'
+    mini模式不创建稠密矩阵，以按列稀疏存储的数据批量计算候选项集的支持度，见find_mini_itemsets
     """
-    matrix,items = gen_matrix(transactions,mode)
+    if mode == 'mini': #mini模式这里不作频繁项集的筛选
+        return find_mini_itemsets(transactions,minimum_support,stats)
+    matrix,items = gen_matrix(transactions,mode,stats)
+    start = time.perf_counter()
     cnts = matrix.sum(0)
-    if mode == 'general':
-        mask = cnts >= minimum_support
-    elif mode == 'mini': #如果为mini模式这里不作频繁项集的筛选
-        mask = cnts >= 0
+    mask = cnts >= minimum_support
     matrix = matrix[:,mask] # 根据最小支持度筛选matrix
     items = items[mask] # 根据最小支持度筛选items
     cnts = cnts[mask] # 根据最小支持度初步筛选cnts
+    if stats is not None:
+        stats.setdefault('candidates',[])
+        stats.setdefault('pruned',[])
+        stats.setdefault('frequent',[])
 
     # 特定长度频繁项集，这里长度为1，即Fk = 1
-    frequent_items_alpha = [(np.asarray([items.tolist().index(item)]),int(round(cnt))) for item,cnt in zip(items,cnts)]
+    frequent_items_alpha = [((idx,),int(round(cnt))) for idx,cnt in enumerate(cnts)]
     # 用于存储所有的频繁项集
     frequent_items = []
     frequent_items.append(frequent_items_alpha)
-    while True:
+    while frequent_items[-1]:
         frequent_items_k_1 = frequent_items[-1] # 上一轮频繁项集
-        items_length = len(frequent_items_k_1) # 上一轮频繁项集个数
         item_num = len(frequent_items_k_1[0][0]) + 1 # 本轮频繁项集长度
         frequent_items_alpha = [] # 特定长度频繁项集，这里长度为>=2，即Fk >= 2
-        count = [] # 存储支持度
-        
-        # 新长度下频繁项集产生基于Fk-1 x Fk-1策略，详细可以查看《数据挖掘导论(完整版)》Pang-Ning Tan,
-        # Michael Steinbach, Vipin Kunmar著 6.2.3小节
-        for i in range(items_length-1):
-            for j in range(i+1,items_length):
-                left_item = frequent_items_k_1[i][0]
-                right_item = frequent_items_k_1[j][0]
-                if item_num >= 3:
-                    condition = (left_item[:-1] == right_item[:-1]).all() and (left_item[-1] != right_item[-1])
-                else:
-                    condition = left_item[-1] != right_item[-1]
-                if condition:
-                    candidate = np.append(left_item,right_item[-1])
-                    if mode == 'general':
-                        cnt = (matrix[:,candidate].sum(1) == item_num).sum()
-                    elif mode == 'mini':
-                        cnt = matrix[:,candidate].min(1).sum()
-                    if cnt >= minimum_support:
-                        frequent_items_alpha.append(candidate)
-                        count.append(cnt)
+        candidates,generated,pruned = gen_candidates([fi[0] for fi in frequent_items_k_1])
+        if stats is not None:
+            stats['candidates'].append(generated)
+            stats['pruned'].append(pruned)
+        for candidate in candidates:
+            cnt = (matrix[:,candidate].sum(1) == item_num).sum()
+            if cnt >= minimum_support:
+                frequent_items_alpha.append((candidate,cnt))
+        if stats is not None:
+            stats['frequent'].append(len(frequent_items_alpha))
         if len(frequent_items_alpha) > 0: #查找至空结束
-            frequent_items_alpha = list(zip(frequent_items_alpha,count))
             frequent_items.append(frequent_items_alpha)
         else:
             break
+    add_time(stats,'mine',time.perf_counter() - start)
     return [([items[idx] for idx in fi[0]],fi[1]) for fis in frequent_items for fi in fis]
 
 if __name__ == '__main__':
@@ -0,0 +1,197 @@
+# encoding: utf-8
+"""
+可复现的性能测试：
+    1、按IBM Quest数据生成器的思路(Agrawal & Srikant, 1994)生成带随机种子的合成购物篮数据，
+       提供稀疏(T10I4D100K)与稠密两种配置，项的种类数、数据条目长度等均可调整；
+    2、在一组支持度上分别运行apriori,eclat,fp_growth,fp_growth2，每次运行在独立子进程中进行，
+       记录耗时、峰值内存(RSS)与每秒产生的频繁项集数；
+    3、检查各算法在同一支持度下的频繁项集及其支持度计数完全一致；
+    4、结果写入json文件，便于不同版本之间比较。
+
+用法: python benchmark.py --profile sparse --transactions 10000 --supports 0.01,0.005 --output bench.json
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+PROFILES = {
+    # T10I4D100K: 平均长度10，潜在频繁模式平均长度4，10万条数据，1000种项
+    'sparse':dict(n_transactions=100000,n_items=1000,avg_length=10,avg_pattern_length=4,n_patterns=2000),
+    # 稠密数据: 项的种类少，数据条目长，模式长且数量少
+    'dense':dict(n_transactions=10000,n_items=75,avg_length=25,avg_pattern_length=10,n_patterns=50),
+}
+
+ENGINES = ('apriori','eclat','fp_growth','fp_growth2')
+
+# 生成一条数据时连续多少次抽取的模式没有新增项即停止(模式的项都已在条目中)
+MAX_STALLED_DRAWS = 100
+
+def generate_baskets(profile='sparse',seed=0,**params):
+    """
+    生成合成购物篮数据，返回双层python链表(项为整数)
+    profile: 'sparse'或'dense'，给出默认参数
+    seed: 随机种子，相同参数与种子生成相同数据
+    params: 覆盖profile的参数，n_transactions,n_items,avg_length,avg_pattern_length,n_patterns,
+            correlation(相邻模式共享项的比例均值,默认0.5),corruption(模式项被丢弃的概率均值,默认0.5)
+    """
+    params = dict(PROFILES[profile],**params)
+    n_items = params['n_items']
+    correlation = params.get('correlation',0.5)
+    corruption = params.get('corruption',0.5)
+    rng = np.random.RandomState(seed)
+
+    # 潜在频繁模式：长度服从泊松分布，部分项来自上一个模式
+    patterns = []
+    for _ in range(params['n_patterns']):
+        length = min(max(1,rng.poisson(params['avg_pattern_length'])),n_items)
+        pattern = []
+        if patterns:
+            shared = min(int(round(rng.exponential(correlation) * length)),length,len(patterns[-1]))
+            pattern = list(rng.choice(patterns[-1],shared,replace=False))
+        candidates = np.setdiff1d(np.arange(n_items),pattern)
+        pattern += list(rng.choice(candidates,length - len(pattern),replace=False))
+        patterns.append(np.asarray(pattern,dtype=np.int64))
+    weights = rng.exponential(1.0,len(patterns))
+    weights /= weights.sum()
+    corruptions = np.clip(rng.normal(corruption,0.1,len(patterns)),0,1)
+
+    baskets = []
+    for _ in range(params['n_transactions']):
+        # 条目长度不超过项的总数；模式的项可能都已在条目中，连续MAX_STALLED_DRAWS次没有新增项时停止
+        size = min(max(1,rng.poisson(params['avg_length'])),n_items)
+        basket = set()
+        stalled = 0
+        while len(basket) < size and stalled < MAX_STALLED_DRAWS:
+            k = rng.choice(len(patterns),p=weights)
+            pattern = patterns[k]
+            # 按模式的丢弃概率去掉部分项
+            pattern = pattern[rng.random_sample(len(pattern)) >= corruptions[k]]
+            if len(basket) + len(pattern) > size and basket and rng.random_sample() < 0.5:
+                break
+            length = len(basket)
+            basket.update(pattern.tolist())
+            stalled = stalled + 1 if len(basket) == length else 0
+        baskets.append(sorted(basket))
+    return baskets
+
+def _normalize(itemsets):
+    """将各算法的输出统一为{frozenset(项):支持度计数}"""
+    return dict((frozenset(itemset),int(round(sup))) for itemset,sup in itemsets)
+
+def _digest(itemsets):
+    """频繁项集结果的摘要，用于跨算法比较"""
+    lines = sorted('%s:%d' % (','.join(sorted(map(str,itemset))),sup) for itemset,sup in itemsets.items())
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+def _peak_rss_kb():
+    """当前进程的峰值常驻内存(KB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_engine(engine,transactions,minimum_support):
+    """
+    运行一个算法并返回测量结果，在独立子进程中执行
+    minimum_support: 支持度计数
+    """
+    import apriori,eclat,fp_growth,fp_growth2
+    find_funcs = {
+        'apriori':lambda: apriori.find_frequent_itemsets(transactions,minimum_support),
+        'eclat':lambda: eclat.find_frequent_itemsets(transactions,minimum_support),
+        'fp_growth':lambda: list(fp_growth.find_frequent_itemsets(transactions,minimum_support,include_support=True)),
+        'fp_growth2':lambda: fp_growth2.find_frequent_itemsets(transactions,minimum_support),
+    }
+    rss_before = _peak_rss_kb()
+    start = time.perf_counter()
+    itemsets = _normalize(find_funcs[engine]())
+    seconds = time.perf_counter() - start
+    return dict(
+        seconds = seconds,
+        peak_rss_kb = _peak_rss_kb(),
+        rss_before_kb = rss_before,
+        itemsets = len(itemsets),
+        itemsets_per_second = len(itemsets) / seconds if seconds > 0 else None,
+        digest = _digest(itemsets),
+    )
+
+def run_benchmark(transactions,supports,engines=ENGINES,dataset=None):
+    """
+    在每一个支持度上运行所有算法并检查结果一致
+    transactions: 数据
+    supports: 支持度链表，float(0-1)为相对支持度，int为支持度计数
+    engines: 参与测试的算法名
+    dataset: 记录在结果中的数据描述
+    返回: 结果记录链表，每条记录包含dataset,engine,minimum_support,support_count,seconds,peak_rss_kb,
+          itemsets,itemsets_per_second,digest,consistent
+    """
+    records = []
+    context = multiprocessing.get_context('spawn')
+    for minimum_support in supports:
+        support_count = minimum_support
+        if type(minimum_support) == float and 0 <= minimum_support <= 1:
+            support_count = len(transactions) * minimum_support
+        group = []
+        for engine in engines:
+            # 每次运行使用新的子进程，峰值内存互不影响
+            with ProcessPoolExecutor(max_workers=1,mp_context=context) as executor:
+                result = executor.submit(run_engine,engine,transactions,support_count).result()
+            record = dict(dataset=dataset,engine=engine,minimum_support=minimum_support,support_count=support_count)
+            record.update(result)
+            group.append(record)
+        consistent = len(set(record['digest'] for record in group)) == 1
+        for record in group:
+            record['consistent'] = consistent
+        records.extend(group)
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='association-analysis benchmark')
+    parser.add_argument('--profile',choices=sorted(PROFILES),default='sparse')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--transactions',type=int,help='数据条目数，默认取profile的设置')
+    parser.add_argument('--items',type=int,help='项的种类数，默认取profile的设置')
+    parser.add_argument('--avg-length',type=float,help='数据条目平均长度，默认取profile的设置')
+    parser.add_argument('--supports',default='0.02,0.01',help='逗号分隔的支持度，小数为相对支持度，整数为支持度计数')
+    parser.add_argument('--engines',default=','.join(ENGINES))
+    parser.add_argument('--output',default='benchmark_results.json')
+    args = parser.parse_args(argv)
+
+    params = {}
+    for name,value in (('n_transactions',args.transactions),('n_items',args.items),('avg_length',args.avg_length)):
+        if value is not None:
+            params[name] = value
+    supports = [float(s) if '.' in s else int(s) for s in args.supports.split(',')]
+    engines = args.engines.split(',')
+
+    transactions = generate_baskets(args.profile,args.seed,**params)
+    dataset = dict(PROFILES[args.profile],profile=args.profile,seed=args.seed,**params)
+    records = run_benchmark(transactions,supports,engines,dataset)
+    report = dict(
+        python = platform.python_version(),
+        numpy = np.__version__,
+        machine = platform.machine(),
+        dataset = dataset,
+        results = records,
+    )
+    with open(args.output,'w',encoding='utf-8') as f:
+        json.dump(report,f,indent=2)
+    for record in records:
+        print('%(engine)-10s support=%(minimum_support)-8s itemsets=%(itemsets)-8d seconds=%(seconds).3f '
+              'peak_rss_kb=%(peak_rss_kb)d consistent=%(consistent)s' % record)
+    return 0 if all(record['consistent'] for record in records) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# encoding: utf-8
+"""
+频繁项集挖掘结果的缓存，置于rule.find_frequent_itemsets之前：
+以数据内容的哈希、算法与影响结果的参数为键，保存各支持度下的挖掘结果；
+同一数据以不低于已缓存支持度的支持度再次请求时，直接从缓存结果中筛选，不再重新挖掘。
+内存中的结果按最近最少使用(LRU)淘汰，总项集数不超过max_itemsets；可选的目录directory以store.save_itemsets格式持久保存结果。
+用法:
+    cache = MiningCache(directory='mining_cache')
+    itemsets = rule.find_frequent_itemsets(apriori.find_frequent_itemsets,datas,0.05,cache=cache)
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from bisect import bisect_right
+from collections import OrderedDict
+
+import numpy as np
+
+from codec import Transactions
+from store import open_itemsets,save_itemsets
+
+# 不影响挖掘结果的参数，不计入缓存的键
+IGNORED_KARGS = frozenset(['n_jobs','executor','stats','reverse','diffset'])
+
+_NOT_FOUND = object()
+
+def fingerprint(transactions):
+    """
+    数据内容的哈希：codec.Transactions直接对其数组求哈希，其它数据逐条求哈希(每条数据内项的顺序无关)，
+    stream.TransactionSource会被完整读取一遍
+    """
+    digest = hashlib.sha1()
+    if isinstance(transactions,Transactions):
+        digest.update(np.ascontiguousarray(transactions.offsets,dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(transactions.items,dtype=np.int32).tobytes())
+        if transactions.codec is not None:
+            digest.update(repr(transactions.codec.items).encode('utf-8'))
+        return digest.hexdigest()
+    for transaction in transactions:
+        digest.update(('\x1e'.join(sorted(repr(item) for item in transaction)) + '\n').encode('utf-8'))
+    return digest.hexdigest()
+
+def _engine_name(find_func):
+    return '%s.%s' % (getattr(find_func,'__module__',''),getattr(find_func,'__qualname__',repr(find_func)))
+
+class _Entry(object):
+    """一个缓存结果：按支持度降序排列的[(项集,支持度计数),...]"""
+    def __init__(self,itemsets):
+        itemsets = list(itemsets)
+        itemsets.sort(key=lambda fi: -fi[1])
+        self.itemsets = itemsets
+        self._negated = [-sup for _,sup in itemsets] # 升序，供二分查找
+
+    def __len__(self):
+        return len(self.itemsets)
+
+    def at_least(self,minimum_support):
+        """支持度计数不低于minimum_support的前缀"""
+        return self.itemsets[:bisect_right(self._negated,-minimum_support)]
+
+class MiningCache(object):
+    """
+    挖掘结果缓存
+    hits,misses,evictions,disk_hits: 命中、未命中、淘汰与从目录中读取的次数
+    """
+    def __init__(self,max_itemsets=10**7,directory=None):
+        """
+        max_itemsets: 内存中保存的项集总数上限，超过时淘汰最近最少使用的结果(最近一次的结果总是保留)
+        directory: 可选的持久化目录，项必须能以json保存(str,int,float)
+        """
+        self.max_itemsets = max_itemsets
+        self.directory = directory
+        self._entries = OrderedDict() # (键,支持度计数) -> _Entry，按使用先后排列
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        if directory is not None:
+            os.makedirs(directory,exist_ok=True)
+
+    @property
+    def stats(self):
+        return dict(hits=self.hits,misses=self.misses,evictions=self.evictions,disk_hits=self.disk_hits,
+                    entries=len(self._entries),itemsets=self._size)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """清空内存中的结果(不删除目录中的结果)"""
+        self._entries.clear()
+        self._size = 0
+
+    @staticmethod
+    def key(find_func,transactions,**kargs):
+        """缓存的键：数据哈希、算法名与影响结果的参数"""
+        mode = sorted((name,repr(value)) for name,value in kargs.items() if name not in IGNORED_KARGS)
+        return '%s|%s|%s' % (fingerprint(transactions),_engine_name(find_func),mode)
+
+    @staticmethod
+    def _reusable(kargs):
+        """更高支持度下的结果能否从缓存结果中筛选得到：最大频繁项集与top-k的结果不能"""
+        return not kargs.get('maximal') and kargs.get('top_k') is None
+
+    def find_frequent_itemsets(self,find_func,transactions,minimum_support,**kargs):
+        """
+        与rule.find_frequent_itemsets相同，但优先从缓存中获取结果
+        返回按支持度计数降序排列的[(项集,支持度计数),...]；算法有include_support参数(fp_growth)时默认设为True
+        """
+        if 'include_support' in inspect.signature(find_func).parameters:
+            kargs.setdefault('include_support',True)
+        if minimum_support is not None and 0 <= minimum_support <= 1 and type(minimum_support) == float:
+            minimum_support = len(transactions) * minimum_support
+        key = self.key(find_func,transactions,**kargs)
+        reusable = self._reusable(kargs)
+
+        found = self._lookup(key,minimum_support,reusable)
+        if found is None and self.directory is not None:
+            found = self._load(key,minimum_support,reusable)
+            if found is not None:
+                self.disk_hits += 1
+        if found is not None:
+            self.hits += 1
+            return found.at_least(minimum_support) if reusable and minimum_support is not None else list(found.itemsets)
+
+        self.misses += 1
+        entry = _Entry(find_func(transactions,minimum_support,**kargs))
+        self._put(key,minimum_support,entry)
+        if self.directory is not None:
+            self._save(key,minimum_support,entry)
+        return list(entry.itemsets)
+
+    @staticmethod
+    def _choose(minimum_support,reusable,supports):
+        """
+        从已缓存的支持度supports中选出能回答请求的一个：可筛选时为不高于请求的最大支持度，否则须相同；
+        没有时返回_NOT_FOUND
+        """
+        if minimum_support is None or not reusable:
+            return minimum_support if minimum_support in supports else _NOT_FOUND
+        usable = [sup for sup in supports if sup is not None and sup <= minimum_support]
+        return max(usable) if usable else _NOT_FOUND
+
+    def _lookup(self,key,minimum_support,reusable):
+        support = self._choose(minimum_support,reusable,[sup for entry_key,sup in self._entries if entry_key == key])
+        if support is _NOT_FOUND:
+            return None
+        self._entries.move_to_end((key,support))
+        return self._entries[(key,support)]
+
+    def _put(self,key,minimum_support,entry):
+        self._entries[(key,minimum_support)] = entry
+        self._size += len(entry)
+        while self._size > self.max_itemsets and len(self._entries) > 1:
+            _,evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _entry_dir(self,key,minimum_support):
+        name = hashlib.sha1(('%s|%r' % (key,minimum_support)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory,name)
+
+    def _save(self,key,minimum_support,entry):
+        path = self._entry_dir(key,minimum_support)
+        try:
+            save_itemsets(path,entry.itemsets)
+        except TypeError: # 项不能以json保存时只缓存在内存中
+            shutil.rmtree(path,ignore_errors=True)
+            return
+        with open(os.path.join(path,'cache.json'),'w',encoding='utf-8') as f:
+            json.dump({'key':key,'minimum_support':minimum_support},f)
+
+    def _load(self,key,minimum_support,reusable):
+        supports = []
+        for name in os.listdir(self.directory):
+            try:
+                with open(os.path.join(self.directory,name,'cache.json'),encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError,ValueError):
+                continue
+            if meta['key'] == key:
+                supports.append(meta['minimum_support'])
+        support = self._choose(minimum_support,reusable,supports)
+        if support is _NOT_FOUND:
+            return None
+        entry = _Entry(open_itemsets(self._entry_dir(key,support)))
+        self._put(key,support,entry)
+        return entry
@@ -0,0 +1,126 @@
+# encoding: utf-8
+"""
+项的整数编码：将任意可哈希的项按频率高低编码为连续的int32 id(出现次数最多的项id为0)，
+编码后的数据以CSR形式存储，即offsets数组与items数组，第i条数据为items[offsets[i]:offsets[i+1]]。
+apriori,eclat,fp_growth,fp_growth2与rule均在id上计算，只在输出结果时解码。
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+from array import array
+
+import numpy as np
+
+from instrument import phase
+
+class ItemCodec(object):
+    """
+    项与id之间的双向映射，id按项的出现次数降序排列
+    """
+    def __init__(self,items=(),counts=None):
+        """
+        items: 按id顺序排列的项
+        counts: 每个项的出现次数，可以为None
+        """
+        self.items = list(items)
+        self.index = dict((item,idx) for idx,item in enumerate(self.items))
+        self.counts = None if counts is None else np.asarray(counts,dtype=np.int64)
+
+    @classmethod
+    def from_counts(cls,items,counts):
+        """根据项及其出现次数创建编码器，出现次数相同的项保持输入顺序"""
+        counts = np.asarray(counts,dtype=np.int64)
+        order = np.argsort(-counts,kind='stable')
+        return cls([items[idx] for idx in order],counts[order])
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self,item):
+        return item in self.index
+
+    def encode(self,transaction):
+        """将一条数据编码为id链表，不在编码器中的项被忽略"""
+        index = self.index
+        return [index[item] for item in transaction if item in index]
+
+    def decode(self,ids):
+        """将id序列解码为项链表"""
+        items = self.items
+        return [items[idx] for idx in ids]
+
+    def items_array(self):
+        """以np.array形式返回所有项，下标即id"""
+        items = np.empty(len(self.items),dtype=object)
+        items[:] = self.items
+        return items
+
+    def encode_itemsets(self,itemsets):
+        """编码频繁项集结果[(项集,支持度计数),...]"""
+        return [(self.encode(itemset),sup) for itemset,sup in itemsets]
+
+    def decode_itemsets(self,itemsets):
+        """解码频繁项集结果[(id项集,支持度计数),...]"""
+        return [(self.decode(itemset),sup) for itemset,sup in itemsets]
+
+class Transactions(object):
+    """
+    以CSR形式存储的已编码数据
+    offsets: 长度为数据条目数+1的数组
+    items: 所有数据条目的项id拼接而成的数组
+    codec: 对应的ItemCodec
+    """
+    def __init__(self,offsets,items,codec=None):
+        self.offsets = offsets
+        self.items = items
+        self.codec = codec
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self,idx):
+        """返回第idx条数据的id数组"""
+        return self.items[self.offsets[idx]:self.offsets[idx+1]]
+
+    def __iter__(self):
+        """逐条返回数据的id链表"""
+        offsets,items = self.offsets,self.items
+        for idx in range(len(self)):
+            yield items[offsets[idx]:offsets[idx+1]].tolist()
+
+    def rows(self):
+        """返回items中每个元素所在的数据条目行号"""
+        return np.repeat(np.arange(len(self),dtype=np.int64),np.diff(self.offsets))
+
+def encode_transactions(transactions,stats=None):
+    """
+    对数据进行一次遍历，完成计数、编码与CSR存储
+    transactions: 类双层python链表，每一项元素代表一条数据；若已经是带有codec的Transactions则直接返回
+    stats: 可选的统计字典(见instrument)，记录count(遍历与计数)与encode(按频率重新编号)两个阶段的耗时
+    返回: (ItemCodec,Transactions)
+    """
+    if isinstance(transactions,Transactions) and transactions.codec is not None:
+        return transactions.codec,transactions
+    with phase(stats,'count'):
+        index = {}
+        ids = array('i')
+        offsets = array('q',[0])
+        for transaction in transactions:
+            for item in transaction:
+                idx = index.get(item)
+                if idx is None:
+                    idx = index[item] = len(index)
+                ids.append(idx)
+            offsets.append(len(ids))
+        ids = np.frombuffer(ids,dtype=np.intc).astype(np.int32) if len(ids) else np.zeros(0,dtype=np.int32)
+        counts = np.bincount(ids,minlength=len(index))
+    with phase(stats,'encode'):
+        # 按出现次数重新编号，出现次数相同的项按首次出现的先后排序
+        codec = ItemCodec.from_counts(list(index),counts)
+        remap = np.empty(len(index),dtype=np.int32)
+        remap[np.argsort(-counts,kind='stable')] = np.arange(len(index),dtype=np.int32)
+        data = Transactions(np.frombuffer(offsets,dtype=np.int64).copy(),remap[ids],codec)
+    return codec,data
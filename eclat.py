@@ -0,0 +1,125 @@
+# encoding: utf-8
+"""
+通过eclat/dEclat算法(垂直数据格式)寻找购物篮数据当中的频繁项集
+
+每个项所在的数据条目以uint64位图存储(每64条数据占用一个字)，相比apriori使用的float64矩阵内存约为其1/64；
+候选项集的支持度由父项集位图与新项位图按位与后统计1的个数得到，无需对整个矩阵重复扫描。
+稠密数据可使用差集(diffset)模式，即dEclat，只保存项集相对其父项集所缺失的数据条目。
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import numpy as np
+
+from codec import encode_transactions
+from instrument import incr,maximum,phase
+
+if hasattr(np,'bitwise_count'):
+    def popcount(bits):
+        """按行统计位图中1的个数"""
+        return np.bitwise_count(bits).sum(-1,dtype=np.int64)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)],dtype=np.uint8)
+    def popcount(bits):
+        """按行统计位图中1的个数"""
+        bits = np.ascontiguousarray(bits)
+        return _POPCOUNT_TABLE[bits.view(np.uint8)].sum(-1,dtype=np.int64)
+
+def bits_to_tids(bits):
+    """将单个位图转换为其所含数据条目的行号数组"""
+    bits = np.ascontiguousarray(bits,dtype='<u8')
+    return np.flatnonzero(np.unpackbits(bits.view(np.uint8),bitorder='little')).astype(np.int64)
+
+def gen_bitsets(transactions,stats=None):
+    """
+    通过购物篮类数据创建每个项的位图，行下标即项的编码id
+    stats: 可选的统计字典(见instrument)，记录count,encode与build(创建位图)阶段的耗时
+    返回: (位图矩阵[项数,字数],items,数据条目数)
+    """
+    codec,data = encode_transactions(transactions,stats)
+    with phase(stats,'build'):
+        length = len(data)
+        rows = data.rows()
+        cols = data.items.astype(np.int64)
+        bitsets = np.zeros((len(codec),(length + 63) // 64),dtype=np.uint64)
+        np.bitwise_or.at(bitsets,(cols,rows >> 6),np.left_shift(np.uint64(1),(rows & 63).astype(np.uint64)))
+    return bitsets,codec.items_array(),length
+
+def find_frequent_itemsets(transactions,minimum_support,diffset=False,stats=None):
+    """
+    基于给定的支持度，查找频繁项集
+    transactions: 类双层python链表，每一项元素代表一条数据
+    minimum_support: 支持度计数
+    diffset: 是否使用差集(dEclat)模式，适用于稠密数据(多数项出现在大部分数据条目中)
+    stats: 可选的字典或instrument.MiningStats，记录各阶段(count,encode,build,mine)的耗时'time'、
+           计算了支持度的候选项集数candidates与最大递归深度recursion_depth
+    返回结果与apriori.find_frequent_itemsets相同: [([项,...],支持度计数),...]
+    """
+    bitsets,items,length = gen_bitsets(transactions,stats)
+    sups = popcount(bitsets)
+    # 按支持度升序排列，使得等价类尽量小
+    order = np.argsort(sups,kind='stable')
+    order = order[sups[order] >= minimum_support]
+    frequent_items = []
+
+    def search_bitset(prefix,idxs,bits,sups):
+        # idxs中每一项与prefix组成的项集属于同一个等价类，其位图为bits
+        maximum(stats,'recursion_depth',len(prefix))
+        for k in range(len(idxs)):
+            itemset = prefix + [idxs[k]]
+            frequent_items.append((itemset,int(sups[k])))
+            if k + 1 < len(idxs):
+                child_bits = bits[k+1:] & bits[k]
+                child_sups = popcount(child_bits)
+                incr(stats,'candidates',len(child_sups))
+                mask = child_sups >= minimum_support
+                if mask.any():
+                    search_bitset(itemset,idxs[k+1:][mask],child_bits[mask],child_sups[mask])
+
+    def search_diffset(prefix,idxs,diffs,sups):
+        # d(PXY) = d(PY) - d(PX), sup(PXY) = sup(PX) - |d(PXY)|
+        maximum(stats,'recursion_depth',len(prefix))
+        for k in range(len(idxs)):
+            itemset = prefix + [idxs[k]]
+            frequent_items.append((itemset,int(sups[k])))
+            incr(stats,'candidates',len(idxs) - k - 1)
+            child_idxs,child_diffs,child_sups = [],[],[]
+            for j in range(k+1,len(idxs)):
+                diff = np.setdiff1d(diffs[j],diffs[k],assume_unique=True)
+                sup = sups[k] - len(diff)
+                if sup >= minimum_support:
+                    child_idxs.append(idxs[j])
+                    child_diffs.append(diff)
+                    child_sups.append(sup)
+            if child_idxs:
+                search_diffset(itemset,child_idxs,child_diffs,child_sups)
+
+    with phase(stats,'mine'):
+        if diffset:
+            # 相对空项集的差集即为项所在数据条目的补集
+            padding = np.zeros(bitsets.shape[1],dtype=np.uint64)
+            if length % 64:
+                padding[-1] = ~np.uint64(0) << np.uint64(length % 64)
+            diffs = [bits_to_tids(~(bitsets[idx] | padding)) for idx in order]
+            search_diffset([],order.tolist(),diffs,sups[order].tolist())
+        else:
+            search_bitset([],order,bitsets[order],sups[order])
+    return [([items[idx] for idx in fi[0]],fi[1]) for fi in frequent_items]
+
+if __name__ == '__main__':
+    datas = [
+        ['a','b'],
+        ['b','c','d'],
+        ['a','c','d','e'],
+        ['a','d','e'],
+        ['a','b','c'],
+        ['a','b','c','d'],
+        ['a'],
+        ['a','b','c'],
+        ['a','b','d'],
+        ['b','c','e']
+    ]
+    print('datas频繁项集:','\n',find_frequent_itemsets(datas,2))
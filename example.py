@@ -11,8 +11,12 @@ import pandas as pd
 inputfile = 'example_data.txt'
 datas = pd.read_csv(inputfile,header=None).values
 datas_size = len(datas)
+# 数据较大时可先转换为二进制存储，再以memmap方式打开：
+# import store
+# datas = store.convert_csv(inputfile,'example_data')
 
 import apriori
+import eclat
 import fp_growth
 import fp_growth2
 import rule
@@ -22,6 +26,7 @@ minimum_confidence = 0.5
 minimum_lift = None
 
 itemsets = rule.find_frequent_itemsets(apriori.find_frequent_itemsets,datas,minimum_support)
+# or itemsets = rule.find_frequent_itemsets(eclat.find_frequent_itemsets,datas,minimum_support)
 # or itemsets = rule.find_frequent_itemsets(fp_growth2.find_frequent_itemsets,datas,minimum_support)
 # or itemsets = list(rule.find_frequent_itemsets(fp_growth.find_frequent_itemsets,datas,minimum_support))
 
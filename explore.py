@@ -0,0 +1,124 @@
+# encoding: utf-8
+"""
+支持度与置信度阈值的交互式选择：只在最低支持度(floor)下挖掘一次，
+结果按支持度计数降序排列，任一不低于floor的支持度下的频繁项集就是这一排列的前缀(二分查找得到其长度)；
+规则同样在floor下一次生成并按支持度降序排列，查询时取前缀再以置信度/提升度掩码筛选。
+用法:
+    explorer = SupportExplorer(fp_growth2.find_frequent_itemsets,datas,0.01)
+    explorer.curve()                    # 各支持度下的频繁项集数
+    explorer.count(0.05)
+    rules = explorer.rules(0.05,0.5)
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import inspect
+
+import numpy as np
+
+from rule import find_frequent_itemsets,find_rules_batch
+
+class SupportExplorer(object):
+    """
+    在最低支持度下挖掘一次，之后查询更高支持度(与置信度)下的项集数、频繁项集与规则
+    """
+    def __init__(self,find_func,transactions,floor_support,floor_confidence=0.5,cache=None,
+                 evaluation_funcs=None,**kargs):
+        """
+        find_func: apriori,eclat,fp_growth2,fp_growth模块下的find_frequent_itemsets
+        floor_support: 最低支持度(计数或比例，含义与rule.find_frequent_itemsets相同)，之后的查询不能低于它
+        floor_confidence: 预先生成规则的最低置信度，查询更低的置信度时以该置信度重新生成一次
+        cache: 可选的cache.MiningCache
+        evaluation_funcs: 规则的自定义评价指标{名称:函数}，见rule.find_rules_batch
+        kargs: 传给find_func的其它参数；closed=True时保存闭频繁项集，规则仍与全部频繁项集的规则相同；
+               maximal与top_k的结果不能按支持度筛选，不支持
+        """
+        if kargs.get('maximal') or kargs.get('top_k') is not None:
+            raise ValueError('maximal与top_k的结果不能按支持度筛选')
+        if 'include_support' in inspect.signature(find_func).parameters:
+            kargs.setdefault('include_support',True)
+        self.transactions_size = len(transactions)
+        self.floor_support = self._count(floor_support)
+        self.closed = bool(kargs.get('closed'))
+        itemsets = list(find_frequent_itemsets(find_func,transactions,self.floor_support,cache=cache,**kargs))
+        itemsets.sort(key=lambda fi: -fi[1])
+        self.itemsets_ = itemsets
+        self.supports = np.asarray([sup for _,sup in itemsets],dtype=np.float64) # 降序
+        self.floor_confidence = floor_confidence
+        self.evaluation_funcs = dict(evaluation_funcs or {})
+        self._rules = None
+        self._rule_supports = None
+
+    def __len__(self):
+        return len(self.itemsets_)
+
+    def _count(self,minimum_support):
+        """支持度比例转换为支持度计数"""
+        if 0 <= minimum_support <= 1 and type(minimum_support) == float:
+            return self.transactions_size * minimum_support
+        return minimum_support
+
+    def _check(self,minimum_support):
+        minimum_support = self._count(minimum_support)
+        if minimum_support < self.floor_support:
+            raise ValueError('支持度计数%s低于挖掘时的最低支持度计数%s' % (minimum_support,self.floor_support))
+        return minimum_support
+
+    @staticmethod
+    def _prefix(supports,minimum_support):
+        """降序排列的supports中不低于minimum_support的前缀长度"""
+        return int(np.searchsorted(-supports,-minimum_support,side='right'))
+
+    def count(self,minimum_support):
+        """minimum_support下的频繁项集(closed=True时为闭频繁项集)数"""
+        return self._prefix(self.supports,self._check(minimum_support))
+
+    def itemsets(self,minimum_support):
+        """minimum_support下的频繁项集[(项集,支持度计数),...]，按支持度计数降序排列"""
+        return self.itemsets_[:self.count(minimum_support)]
+
+    def _rule_table(self,minimum_conf):
+        """floor下的规则表，按支持度降序排列；请求的置信度低于floor_confidence时降低floor_confidence并重新生成"""
+        if self._rules is None or minimum_conf < self.floor_confidence:
+            self.floor_confidence = min(self.floor_confidence,minimum_conf)
+            rules = find_rules_batch(self.itemsets_,self.transactions_size,self.floor_confidence,
+                                     closed=self.closed,**self.evaluation_funcs)
+            self._rules = rules[np.argsort(-rules['support'],kind='stable')]
+            # 规则的支持度(比例)还原为前件后件并集的支持度计数，消除浮点误差以便与支持度计数比较
+            self._rule_supports = np.round(self._rules['support'] * self.transactions_size,6)
+        return self._rules
+
+    def rules(self,minimum_support,minimum_conf,minimum_lift=None):
+        """
+        minimum_support,minimum_conf(,minimum_lift)下的规则，与对挖掘结果调用rule.find_rules_batch的结果相同
+        返回: numpy结构化数组，列为left,right,support,confidence,lift,[自定义的评价指标]，按支持度降序排列
+        """
+        minimum_support = self._check(minimum_support)
+        rules = self._rule_table(minimum_conf)
+        rules = rules[:self._prefix(self._rule_supports,minimum_support)]
+        mask = rules['confidence'] >= minimum_conf
+        if minimum_lift is not None:
+            mask &= rules['lift'] >= minimum_lift
+        return rules[mask]
+
+    def curve(self,supports=None,minimum_conf=None):
+        """
+        支持度-项集数曲线，用于选择阈值
+        supports: 需要的支持度(计数或比例)，为None时取挖掘结果中出现的所有支持度计数
+        minimum_conf: 给出时同时返回该置信度下各支持度的规则数
+        返回: [(支持度计数,频繁项集数),...]或[(支持度计数,频繁项集数,规则数),...]，按支持度升序排列
+        """
+        if supports is None:
+            supports = np.unique(self.supports).tolist()
+        else:
+            supports = sorted(self._check(sup) for sup in supports)
+        counts = [self._prefix(self.supports,sup) for sup in supports]
+        if minimum_conf is None:
+            return list(zip(supports,counts))
+        rules = self._rule_table(minimum_conf)
+        rule_supports = self._rule_supports[rules['confidence'] >= minimum_conf]
+        rule_counts = [self._prefix(rule_supports,sup) for sup in supports]
+        return list(zip(supports,counts,rule_counts))
@@ -13,19 +13,34 @@ Note:
 
     2、This file is a updated version, which is support py3. github url: "https://github.com/Nana0606/python3-fp-growth"
 """
-from collections import defaultdict, namedtuple
+from itertools import combinations
+
+from instrument import incr, maximum, merge, phase, timed
+from parallel import is_parallel, map_tasks
+from spill import ProjectedDatabases
+from stream import encode_source
+from topk import TopK
+
+# Rough memory footprint in bytes of one tree node, including its entries in
+# the children dictionary of its parent; used to enforce `memory_limit`.
+NODE_BYTES = 100
 
 # original author information, this verison is updated by lina.
 __author__ = 'Eric Naeseth <eric@naeseth.com>'
 __copyright__ = 'Copyright © 2009 Eric Naeseth'
 __license__ = 'MIT License'
 
-def find_frequent_itemsets(transactions, minimum_support, include_support=False):
+def find_frequent_itemsets(transactions, minimum_support, include_support=False,
+                           n_jobs=None, executor=None, stats=None,
+                           closed=False, maximal=False, top_k=None, min_length=1,
+                           memory_limit=None):
     """
     Find frequent itemsets in the given transactions using FP-growth. This
     function returns a generator instead of an eagerly-populated list of items.
 
-    The `transactions` parameter can be any iterable of iterables of items.
+    The `transactions` parameter can be any iterable of iterables of items,
+    or a `stream.TransactionSource`, which is read twice chunk by chunk (once
+    to count the items, once to build the tree) and never held in memory.
     `minimum_support` should be an integer specifying the minimum number of
     occurrences of an itemset for it to be accepted.
 
@@ -34,49 +49,317 @@ def find_frequent_itemsets(transactions, minimum_support, include_support=False)
 
     If `include_support` is true, yield (itemset, support) pairs instead of
     just the itemsets.
+
+    If `n_jobs` (a number of processes, -1 for all CPUs) or `executor` (a
+    `concurrent.futures.Executor`) is given, the conditional pattern base of
+    each frequent item of the master tree is mined in a separate process,
+    largest first.
+
+    If `stats` (a dictionary or an `instrument.MiningStats`) is given, the
+    time spent in each phase (count, encode, build, mine) is recorded in it,
+    together with the size and depth of the master tree, the number of
+    conditional trees built and the deepest level of the recursion. Mining
+    time excludes the time the caller spends between yielded itemsets.
+
+    If `closed` is true, only the closed frequent itemsets (those without a
+    superset of the same support) are found; if `maximal` is true, only the
+    maximal ones (those without a frequent superset). Non-closed or
+    non-maximal branches are pruned during the search (see `find_condensed`),
+    which always runs in this process: `n_jobs` and `executor` are ignored.
+
+    If `top_k` is given, only the `top_k` most frequent itemsets with at
+    least `min_length` items are found, together with any itemsets tied
+    with the last of them, most frequent first. `minimum_support` may then
+    be None; otherwise it is a lower bound. The support threshold rises as
+    the best itemsets are found and prunes the rest of the search (see
+    `find_top_k`), which runs in this process.
+
+    If `memory_limit` (a number of bytes) is given, the conditional trees
+    kept alive along the recursion, the master tree included, are held
+    within that budget: once the trees in memory exceed it, the conditional
+    pattern bases of the current tree are written to disk as projected
+    databases and the tree is released, and the bases are then read back and
+    mined one at a time (see `spill.ProjectedDatabases`). It applies to the
+    plain search, in this process or in each worker.
     """
-    items = defaultdict(lambda: 0)  # mapping from items to their supports
+    # Encode the items as integer IDs ranked by decreasing frequency, counting
+    # the support of individual items in the same pass. The tree is built and
+    # mined on the IDs; itemsets are decoded only when they are yielded.
+    codec, transactions = encode_source(transactions, stats)
 
-    # Load the passed-in transactions and count the support that individual
-    # items have.
-    for transaction in transactions:
-        for item in transaction:
-            items[item] += 1
+    # With top_k, the k-th largest item support already bounds the threshold.
+    if top_k is not None:
+        top = TopK(top_k, minimum_support, min_length)
+        top.bound(codec.counts)
+        minimum_support = top.threshold
 
-    # Remove infrequent items from the item support dictionary.
-    items = dict((item, support) for item, support in items.items()
-        if support >= minimum_support)
+    # Infrequent items are exactly the IDs past the last frequent one.
+    frequent_count = int((codec.counts >= minimum_support).sum())
 
     # Build our FP-tree. Before any transactions can be added to the tree, they
     # must be stripped of infrequent items and their surviving items must be
-    # sorted in decreasing order of frequency.
+    # sorted in decreasing order of frequency, i.e. in increasing ID order.
     def clean_transaction(transaction):
-        transaction = filter(lambda v: v in items, transaction)
-        transaction_list = list(transaction)   # 为了防止变量在其他部分调用，这里引入临时变量transaction_list
-        transaction_list.sort(key=lambda v: items[v], reverse=True)
+        transaction_list = [v for v in transaction if v < frequent_count]
+        transaction_list.sort()
         return transaction_list
 
-    master = FPTree()
-    for transaction in map(clean_transaction, transactions):
-        master.add(transaction)
+    with phase(stats, 'build'):
+        master = FPTree()
+        for transaction in map(clean_transaction, transactions):
+            master.add(transaction)
+    if stats is not None:
+        stats['tree_nodes'] = master.node_num
+        stats['tree_depth'] = master.maxdepth
 
-    def find_with_suffix(tree, suffix):
-        for item, nodes in tree.items():
-            support = sum(n.count for n in nodes)
-            if support >= minimum_support and item not in suffix:
-                # New winner!
-                found_set = [item] + suffix
-                yield (found_set, support) if include_support else found_set
+    # Search for frequent itemsets, and yield the results we find.
+    if top_k is not None:
+        with phase(stats, 'mine'):
+            find_top_k(master, [], top, stats)
+        found = top.result()
+    elif closed or maximal:
+        found = find_condensed(master, [], minimum_support, maximal,
+                               PatternStore(), stats)
+    elif is_parallel(n_jobs, executor) and master.single_path() is None:
+        found = find_in_parallel(master, minimum_support, n_jobs, executor,
+                                 stats, memory_limit)
+    elif memory_limit is not None:
+        found = find_with_spill(master, minimum_support, memory_limit, stats)
+        del master # only the search holds the tree, so that it can drop it
+    else:
+        found = find_with_suffix(master, [], minimum_support, stats)
+    for itemset, support in timed(stats, 'mine', found):
+        decoded = codec.decode(itemset)
+        yield (decoded, support) if include_support else decoded
+
+def find_with_spill(tree, minimum_support, memory_limit, stats=None):
+    """
+    Generate the same (itemset, support) pairs as `find_with_suffix(tree, [],
+    minimum_support)`, keeping the conditional trees within `memory_limit`
+    bytes. The projected databases are removed when the search ends.
+    """
+    with ProjectedDatabases(memory_limit, stats=stats) as spill:
+        found = find_with_suffix(tree, [], minimum_support, stats, spill)
+        del tree
+        for s in found:
+            yield s
+
+def find_with_suffix(tree, suffix, minimum_support, stats=None, spill=None):
+    """
+    Generate (itemset, support) pairs for the frequent itemsets found in
+    `tree`, each extended by the items in `suffix`. The conditional trees
+    built and the recursion depth are counted in `stats` if it is given.
+
+    If `spill` (a `spill.ProjectedDatabases`) is given, the size of `tree` is
+    charged to its budget while the tree is searched. When the budget is
+    exceeded, the conditional pattern bases of the frequent items are written
+    to disk first and `tree` is dropped, so that only the conditional tree
+    being mined stays in memory. Conditional trees are passed straight to
+    the recursive call for the same reason: no caller keeps a reference.
+    """
+    maximum(stats, 'recursion_depth', len(suffix))
+    path = tree.single_path()
+    if path is not None:
+        # A tree without branches needs no further conditional trees: every
+        # combination of its frequent nodes is frequent, and its support is
+        # the count of its deepest node. Counts never increase down a path,
+        # so the frequent nodes form a prefix of it.
+        path = [node for node in path if node.count >= minimum_support]
+        for size in range(1, len(path) + 1):
+            for nodes in combinations(path, size):
+                yield ([node.item for node in nodes] + suffix, nodes[-1].count)
+        return
+
+    nbytes = 0 if spill is None else tree.nbytes
+    if spill is not None and spill.acquire(nbytes):
+        frequent = [(item, tree.support(item)) for item, _ in tree.items()
+                    if tree.support(item) >= minimum_support
+                    and item not in suffix]
+        spilled = [(item, support, spill.write(pattern_base(tree, item)))
+                   for item, support in frequent]
+        spill.release(nbytes)
+        del tree
+        for item, support, base_path in spilled:
+            found_set = [item] + suffix
+            yield (found_set, support)
+            incr(stats, 'conditional_trees')
+            cond_trees = find_with_suffix(
+                tree_from_pattern_base(spill.read(base_path), minimum_support),
+                found_set, minimum_support, stats, spill)
+            for s in cond_trees:
+                yield s
+        return
+
+    for item, nodes in tree.items():
+        support = tree.support(item)
+        if support >= minimum_support and item not in suffix:
+            # New winner!
+            found_set = [item] + suffix
+            yield (found_set, support)
+
+            # Build a conditional tree and recursively search for frequent
+            # itemsets within it.
+            incr(stats, 'conditional_trees')
+            cond_trees = find_with_suffix(
+                conditional_tree(tree, item, minimum_support), found_set,
+                minimum_support, stats, spill)
+            for s in cond_trees:
+                yield s # pass along the good news to our caller
+    if spill is not None:
+        spill.release(nbytes)
+
+def find_condensed(tree, suffix, minimum_support, maximal, store, stats=None):
+    """
+    Generate (itemset, support) pairs for the closed frequent itemsets found
+    in `tree`, each extended by the items in `suffix` (FPClose), or for the
+    maximal ones if `maximal` is true (FPMax).
+
+    Items are visited from the least frequent (highest ID) up. Any superset
+    of a new itemset that adds a less frequent item therefore lies in a branch
+    that has already been searched, and its closed or maximal superset is in
+    `store`, a `PatternStore` shared by the whole search. Items that occur in
+    every transaction of the new itemset are merged into it directly; if the
+    result is covered by a stored itemset, the whole branch is skipped.
+    """
+    maximum(stats, 'recursion_depth', len(suffix))
+    for item in sorted((item for item, nodes in tree.items()), reverse=True):
+        support = tree.support(item)
+        if support < minimum_support:
+            continue
+
+        base = pattern_base(tree, item)
+        if tree.fp_array is not None:
+            counts = dict(tree.fp_array.get(item, {}))
+        else:
+            counts = {}
+            for path, count in base:
+                for other in path:
+                    counts[other] = counts.get(other, 0) + count
+        merged = [other for other, count in counts.items() if count == support]
+        rest = [other for other, count in counts.items()
+                if minimum_support <= count < support]
+        found_set = [item] + merged + suffix
+
+        if maximal:
+            # Look ahead: if the itemset with every frequent extension is
+            # already covered, nothing below it can be maximal.
+            if store.subsumes(found_set + rest):
+                continue
+            if not rest:
+                store.add(found_set, support)
+                yield (found_set, support)
+                continue
+        else:
+            if store.subsumes(found_set, support):
+                continue
+            store.add(found_set, support)
+            yield (found_set, support)
+            if not rest:
+                continue
+
+        # The merged items are part of every itemset below; leave them out
+        # of the conditional tree.
+        for other in merged:
+            counts[other] = 0
+        cond_tree = tree_from_pattern_base(base, minimum_support, counts)
+        incr(stats, 'conditional_trees')
+        for s in find_condensed(cond_tree, found_set, minimum_support,
+                                maximal, store, stats):
+            yield s
+
+def find_top_k(tree, suffix, top, stats=None):
+    """
+    Push the frequent itemsets found in `tree`, each extended by the items
+    in `suffix`, into the `topk.TopK` collector `top`. Items are visited in
+    decreasing order of support so that the threshold of `top` rises as
+    early as possible; conditional trees are built at the current threshold.
+    """
+    maximum(stats, 'recursion_depth', len(suffix))
+    supports = sorted(((tree.support(item), item) for item, nodes in tree.items()),
+                      reverse=True)
+    for support, item in supports:
+        if support < top.threshold:
+            # Every remaining item has a lower support.
+            break
+        found_set = [item] + suffix
+        top.push(found_set, support)
+        cond_tree = conditional_tree(tree, item, top.threshold)
+        incr(stats, 'conditional_trees')
+        find_top_k(cond_tree, found_set, top, stats)
+
+class PatternStore(object):
+    """
+    The closed or maximal itemsets found so far by `find_condensed`, indexed
+    by item so that a superset check only scans the itemsets that contain
+    the query's least covered item.
+    """
 
-                # Build a conditional tree and recursively search for frequent
-                # itemsets within it.
-                cond_tree = conditional_tree_from_paths(tree.prefix_paths(item))
-                for s in find_with_suffix(cond_tree, found_set):
-                    yield s # pass along the good news to our caller
+    def __init__(self):
+        # A dictionary mapping items to the (itemset, support) pairs that
+        # contain them.
+        self._containing = {}
 
-    # Search for frequent itemsets, and yield the results we find.
-    for itemset in find_with_suffix(master, []):
-        yield itemset
+    def add(self, itemset, support):
+        """Store a closed or maximal itemset with its support."""
+        entry = (frozenset(itemset), support)
+        for item in entry[0]:
+            self._containing.setdefault(item, []).append(entry)
+
+    def subsumes(self, itemset, support=None):
+        """
+        Check whether a stored itemset contains `itemset` and, unless
+        `support` is None, has the given support.
+        """
+        candidates = min((self._containing.get(item, ()) for item in itemset),
+                         key=len)
+        itemset = frozenset(itemset)
+        for stored, stored_support in candidates:
+            if itemset <= stored and (support is None
+                                      or stored_support == support):
+                return True
+        return False
+
+def find_in_parallel(tree, minimum_support, n_jobs=None, executor=None,
+                     stats=None, memory_limit=None):
+    """
+    Generate the same (itemset, support) pairs as `find_with_suffix(tree, [],
+    minimum_support)`, mining the conditional pattern base of each frequent
+    item of `tree` in a worker process. The counters collected by the workers
+    are merged into `stats`. Each worker keeps to `memory_limit` on its own.
+    """
+    tasks, sizes = [], []
+    for item, nodes in tree.items():
+        support = tree.support(item)
+        if support >= minimum_support:
+            base = pattern_base(tree, item)
+            tasks.append((item, support, base, minimum_support,
+                          stats is not None, memory_limit))
+            sizes.append(sum(len(path) for path, count in base))
+
+    results = map_tasks(mine_pattern_base, tasks, sizes, n_jobs, executor)
+    for found, task_stats in results:
+        merge(stats, task_stats)
+        for s in found:
+            yield s
+
+def mine_pattern_base(item, support, base, minimum_support, collect_stats=False,
+                      memory_limit=None):
+    """
+    Return the list of (itemset, support) pairs for `item` and the frequent
+    itemsets of its conditional pattern base, and the counters of the search
+    (None unless `collect_stats` is true). Runs in a worker process.
+    """
+    stats = {} if collect_stats else None
+    found = [([item], support)]
+    cond_tree = tree_from_pattern_base(base, minimum_support)
+    incr(stats, 'conditional_trees')
+    if memory_limit is None:
+        found.extend(find_with_suffix(cond_tree, [item], minimum_support, stats))
+    else:
+        with ProjectedDatabases(memory_limit, stats=stats) as spill:
+            found.extend(find_with_suffix(cond_tree, [item], minimum_support,
+                                          stats, spill))
+    return found, stats
 
 class FPTree(object):
     """
@@ -86,8 +369,6 @@ class FPTree(object):
     (i.e., all items must be valid as dictionary keys or set members).
     """
 
-    Route = namedtuple('Route', 'head tail')
-
     def __init__(self):
         # The root node of the tree.
         self._root = FPNode(self, None, None)
@@ -96,33 +377,74 @@ class FPTree(object):
         # "neighbors" that will hit every node containing that item.
         self._routes = {}
 
+        # A dictionary mapping items to their total count in the tree.
+        self._supports = {}
+
+        # The FP-array of the tree: for each item, a dictionary mapping the
+        # items that precede it on its prefix paths to their counts, i.e. the
+        # item supports of the item's conditional tree. Only filled in by
+        # `conditional_tree`; None for trees built transaction by transaction.
+        self.fp_array = None
+
+        # The number of nodes below the root, kept up to date as nodes are
+        # created and detached.
+        self._node_count = 0
+
     @property
     def root(self):
         """The root node of the tree."""
         return self._root
 
-    def add(self, transaction):
-        """Add a transaction to the tree."""
-        point = self._root
+    def add(self, transaction, count=1):
+        """Add a transaction to the tree, `count` times."""
+        self._insert(self._root, transaction, count)
+
+    def _insert(self, point, transaction, count=1):
+        """
+        Add a transaction below the node `point` instead of the root, `count`
+        times. Its items must follow the items on the path to `point`.
+        """
+        supports = self._supports
 
         for item in transaction:
             next_point = point.search(item)
             if next_point:
                 # There is already a node in this tree for the current
                 # transaction item; reuse it.
-                next_point.increment()
+                next_point._count += count
             else:
-                # Create a new point and add it as a child of the point we're
-                # currently looking at.
-                next_point = FPNode(self, item)
-                point.add(next_point)
-
-                # Update the route of nodes that contain this item to include
-                # our new node.
-                self._update_route(next_point)
+                # Create a new point as a child of the point we're currently
+                # looking at, and add it to the route of nodes that contain
+                # this item.
+                next_point = self._new_node(point, item, count)
 
+            supports[item] = supports.get(item, 0) + count
             point = next_point
 
+    def _new_node(self, parent, item, count):
+        """
+        Create a node for `item` under `parent` and append it to the item's
+        route. This is the trusted internal path: the arguments are assumed to
+        be valid, so none of the checks of the public FPNode API are run.
+        """
+        node = FPNode.__new__(FPNode)
+        node._tree = self
+        node._item = item
+        node._count = count
+        node._parent = parent
+        node._children = None
+        node._neighbor = None
+        parent._add_child(node)
+        self._node_count += 1
+
+        route = self._routes.get(item)
+        if route is None:
+            self._routes[item] = [node, node]
+        else:
+            route[1]._neighbor = node # route[1] is the tail
+            route[1] = node
+        return node
+
     def _update_route(self, point):
         """Add the given node to the route through all nodes for its item."""
         assert self is point.tree
@@ -130,10 +452,98 @@ class FPTree(object):
         try:
             route = self._routes[point.item]
             route[1].neighbor = point # route[1] is the tail
-            self._routes[point.item] = self.Route(route[0], point)
+            route[1] = point
         except KeyError:
             # First node for this item; start a new route.
-            self._routes[point.item] = self.Route(point, point)
+            self._routes[point.item] = [point, point]
+
+    def _detach(self, *nodes):
+        """
+        Remove each of `nodes` and its subtree from the tree; no node may lie
+        in the subtree of another. Return, for each node, the transactions
+        that were stored in its subtree as (items from the node down, count)
+        pairs, where count is the number of transactions ending at each node.
+        The routes of the removed items are relinked once for all the nodes.
+        """
+        removed = set()
+        detached = []
+        for node in nodes:
+            node._parent._remove_child(node._item)
+            transactions = []
+            stack = [(node, [node._item])]
+            while stack:
+                point, path = stack.pop()
+                removed.add(point)
+                self._supports[point._item] -= point._count
+                ending = point._count
+                for child in point.children:
+                    ending -= child._count
+                    stack.append((child, path + [child._item]))
+                if ending > 0:
+                    transactions.append((path, ending))
+            detached.append(transactions)
+
+        self._node_count -= len(removed)
+
+        # Unlink the removed nodes from the routes of their items.
+        for item in set(point._item for point in removed):
+            head = tail = None
+            for point in list(self.nodes(item)):
+                if point in removed:
+                    continue
+                if tail is None:
+                    head = point
+                else:
+                    tail._neighbor = point
+                tail = point
+            if tail is None:
+                del self._routes[item]
+            else:
+                tail._neighbor = None
+                self._routes[item] = [head, tail]
+
+        return detached
+
+    def support(self, item):
+        """The total count of the given item in the tree."""
+        return self._supports.get(item, 0)
+
+    def _depths(self):
+        """Generate the depth of every node below the root."""
+        stack = [(child, 1) for child in self._root.children]
+        while stack:
+            node, depth = stack.pop()
+            yield depth
+            stack.extend((child, depth + 1) for child in node.children)
+
+    @property
+    def nbytes(self):
+        """An estimate of the memory held by the nodes of the tree."""
+        return self._node_count * NODE_BYTES
+
+    @property
+    def node_num(self):
+        """The number of nodes in the tree, not counting the root."""
+        return sum(1 for _ in self._depths())
+
+    @property
+    def maxdepth(self):
+        """The length of the longest path below the root."""
+        return max(self._depths(), default=0)
+
+    def single_path(self):
+        """
+        Return the list of nodes below the root if the tree has no branches;
+        otherwise, return `None`.
+        """
+        path = []
+        node = self._root
+        while node._children is not None:
+            if type(node._children) is dict:
+                return None
+            node = node._children
+            path.append(node)
+        return path
 
     def items(self):
         """
@@ -186,46 +596,80 @@ def conditional_tree_from_paths(paths):
     """Build a conditional FP-tree from the given prefix paths."""
     tree = FPTree()
     condition_item = None
-    items = set()
 
     # Import the nodes in the paths into the new tree. Only the counts of the
-    # leaf notes matter; the remaining counts will be reconstructed from the
-    # leaf counts.
+    # leaf notes matter; every node on a path receives the count of its leaf.
     for path in paths:
         if condition_item is None:
             condition_item = path[-1].item
-
-        point = tree.root
-        for node in path:
-            next_point = point.search(node.item)
-            if not next_point:
-                # Add a new node to the tree.
-                items.add(node.item)
-                count = node.count if node.item == condition_item else 0
-                next_point = FPNode(tree, node.item, count)
-                point.add(next_point)
-                tree._update_route(next_point)
-            point = next_point
+        tree.add([node.item for node in path], path[-1].count)
 
     assert condition_item is not None
 
-    # Calculate the counts of the non-leaf nodes.
-    for path in tree.prefix_paths(condition_item):
-        count = path[-1].count
-        for node in reversed(path[:-1]):
-            node._count += count
+    return tree
+
+def conditional_tree(tree, item, minimum_support):
+    """
+    Build the conditional FP-tree of `item` in `tree`, leaving out `item`
+    itself and every item that is infrequent in its conditional pattern base.
+    """
+    counts = None if tree.fp_array is None else tree.fp_array.get(item, {})
+    return tree_from_pattern_base(pattern_base(tree, item), minimum_support, counts)
+
+def pattern_base(tree, item):
+    """
+    Return the conditional pattern base of `item` in `tree` as a list of
+    (prefix path items, count) pairs.
+    """
+    base = []
+    for node in tree.nodes(item):
+        path = []
+        parent = node.parent
+        while not parent.root:
+            path.append(parent.item)
+            parent = parent.parent
+        path.reverse()
+        base.append((path, node.count))
+    return base
+
+def tree_from_pattern_base(base, minimum_support, counts=None):
+    """
+    Build an FP-tree from a conditional pattern base, keeping only the items
+    that are frequent in it. `counts` maps the items of the base to their
+    supports if they are already known (e.g. from an FP-array). The FP-array
+    of the new tree is filled in while its paths are inserted.
+    """
+    if counts is None:
+        counts = {}
+        for path, count in base:
+            for item in path:
+                counts[item] = counts.get(item, 0) + count
+
+    tree = FPTree()
+    fp_array = tree.fp_array = {}
+    for path, count in base:
+        path = [item for item in path if counts[item] >= minimum_support]
+        tree.add(path, count)
+        for i in range(1, len(path)):
+            row = fp_array.setdefault(path[i], {})
+            for preceding in path[:i]:
+                row[preceding] = row.get(preceding, 0) + count
 
     return tree
 
 class FPNode(object):
     """A node in an FP tree."""
 
+    __slots__ = ('_tree', '_item', '_count', '_parent', '_children', '_neighbor')
+
     def __init__(self, tree, item, count=1):
         self._tree = tree
         self._item = item
         self._count = count
         self._parent = None
-        self._children = {}
+        # None for a leaf, the child itself for a node with a single child,
+        # and a dictionary mapping items to children otherwise.
+        self._children = None
         self._neighbor = None
 
     def add(self, child):
@@ -234,22 +678,44 @@ class FPNode(object):
         if not isinstance(child, FPNode):
             raise TypeError("Can only add other FPNodes as children")
 
-        if not child.item in self._children:
-            self._children[child.item] = child
+        if not child.item in self:
+            self._add_child(child)
             child.parent = self
 
+    def _add_child(self, child):
+        """Store `child` among the children of this node, unchecked."""
+        children = self._children
+        if children is None:
+            self._children = child
+        elif type(children) is dict:
+            children[child._item] = child
+        else:
+            self._children = {children._item: children, child._item: child}
+
+    def _remove_child(self, item):
+        """Remove the child for `item` from the children of this node."""
+        children = self._children
+        if type(children) is dict:
+            del children[item]
+            if len(children) == 1:
+                self._children = next(iter(children.values()))
+        elif children is not None and children._item == item:
+            self._children = None
+
     def search(self, item):
         """
         Check whether this node contains a child node for the given item.
         If so, that node is returned; otherwise, `None` is returned.
         """
-        try:
-            return self._children[item]
-        except KeyError:
+        children = self._children
+        if children is None:
             return None
+        if type(children) is dict:
+            return children.get(item)
+        return children if children._item == item else None
 
     def __contains__(self, item):
-        return item in self._children
+        return self.search(item) is not None
 
     @property
     def tree(self):
@@ -280,7 +746,7 @@ class FPNode(object):
     @property
     def leaf(self):
         """True if this node is a leaf in the tree; false if otherwise."""
-        return len(self._children) == 0
+        return self._children is None
 
     @property
     def parent(self):
@@ -314,7 +780,12 @@ class FPNode(object):
     @property
     def children(self):
         """The nodes that are children of this node."""
-        return tuple(self._children.itervalues())
+        children = self._children
+        if children is None:
+            return ()
+        if type(children) is dict:
+            return tuple(children.values())
+        return (children,)
 
     def inspect(self, depth=0):
         print(('  ' * depth) + repr(self))
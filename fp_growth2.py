@@ -9,177 +9,382 @@ Introduction to Data Mining. 1st ed. Boston: Pearson / Addison Wesley, 2006. (pp
 __copyright__ = 'Copyright © 2022 ERSSLE'
 __license__ = 'MIT License'
 
+import sys
+from array import array
 from collections import defaultdict
 
+from instrument import incr,maximum,merge,phase
+from parallel import is_parallel,map_tasks
+from spill import ProjectedDatabases
+from stream import encode_source
+from topk import TopK
+
 class FPTree(object):
     """
     创建一颗FP树，算法的逻辑来源于 Tan, Pang-Ning, Michael Steinbach, and Vipin Kumar. 
     Introduction to Data Mining. 1st ed. Boston: Pearson / Addison Wesley, 2006. (pp. 363-370)
+    树的节点以若干平行的数组存储，节点id即数组下标，root节点id=0：
+        _item: 节点的项编号(项本身保存在_items中)
+        _count: 节点计数
+        _parent: 父节点
+        _first_child/_next_sibling: 第一个子节点与下一个兄弟节点，用于遍历子节点
+        _node_link: 下一个同项节点，用于遍历某一项的所有节点
+        _depth: 节点深度
     """
     def __init__(self,reverse=True):
         """
         初始化：reverse指定树生长时的排序方式，默认从高频项到低频项，也可反转（False）
         """
         self._reverse = reverse
-        self._nodes_level = defaultdict(lambda: set())
-        self._nodes_cluster = defaultdict(lambda: set())
-        self._nodes_parent = defaultdict(lambda: None)
-        self._nodes_children = defaultdict(lambda: set())
-        self._nodes_count = defaultdict(lambda: 0)
-        
-        self._nodes_level['lv_0'].add(0)
-        self._nodes_cluster['root'].add(0)
-        self._nodes_parent[0] = None
-        self._nodes_children[0] = set()
-        self._nodes_count[0] = None
-        
+        self._items = [] # 项编号到项
+        self._item_index = {} # 项到项编号
+        self._heads = array('q') # 每个项编号的第一个节点
+        self._tails = array('q') # 每个项编号的最后一个节点
+        self._item_counts = array('q') # 每个项编号在树中的总计数
+        self._root_children = {} # root节点的子节点，root节点分支较多，以哈希查找
+
+        self._item = array('i',[-1])
+        self._count = array('q',[0])
+        self._parent = array('q',[-1])
+        self._first_child = array('q',[-1])
+        self._next_sibling = array('q',[-1])
+        self._node_link = array('q',[-1])
+        self._depth = array('i',[0])
+        self._maxdepth = 0
+
+    def _item_code(self,item):
+        """返回项的编号，不存在时新建"""
+        code = self._item_index.get(item)
+        if code is None:
+            code = self._item_index[item] = len(self._items)
+            self._items.append(item)
+            self._heads.append(-1)
+            self._tails.append(-1)
+            self._item_counts.append(0)
+        return code
+
+    def _find_child(self,node,code):
+        """查找node下项编号为code的子节点，不存在时返回-1"""
+        if node == 0:
+            return self._root_children.get(code,-1)
+        child = self._first_child[node]
+        item,next_sibling = self._item,self._next_sibling
+        while child >= 0 and item[child] != code:
+            child = next_sibling[child]
+        return child
+
+    def _new_node(self,code,parent):
+        """在parent下新建一个项编号为code的节点，时间复杂度O(1)"""
+        node = len(self._item)
+        depth = self._depth[parent] + 1
+        self._item.append(code)
+        self._count.append(0)
+        self._parent.append(parent)
+        self._first_child.append(-1)
+        self._next_sibling.append(self._first_child[parent])
+        self._first_child[parent] = node
+        self._node_link.append(-1)
+        self._depth.append(depth)
+        if depth > self._maxdepth:
+            self._maxdepth = depth
+        if parent == 0:
+            self._root_children[code] = node
+        tail = self._tails[code]
+        if tail >= 0:
+            self._node_link[tail] = node
+        else:
+            self._heads[code] = node
+        self._tails[code] = node
+        return node
+
     @property
     def node_datas(self):
         """
         返回所含所有fp树结构信息的数据
         """
+        nodes_level = defaultdict(lambda: set())
+        nodes_cluster = defaultdict(lambda: set())
+        nodes_parent = {0:None}
+        nodes_children = dict((node,set()) for node in range(len(self._item)))
+        nodes_count = {0:None}
+        nodes_level['lv_0'].add(0)
+        nodes_cluster['root'].add(0)
+        for node in range(1,len(self._item)):
+            parent = self._parent[node]
+            nodes_level['lv_%s' % self._depth[node]].add(node)
+            nodes_cluster[self._items[self._item[node]]].add(node)
+            nodes_parent[node] = parent
+            nodes_children[parent].add(node)
+            nodes_count[node] = self._count[node]
         return dict(
-            nodes_level = dict(self._nodes_level),
-            nodes_cluster = dict(self._nodes_cluster),
-            nodes_parent = dict(self._nodes_parent),
-            nodes_children = dict(self._nodes_children),
-            nodes_count = dict(self._nodes_count)
+            nodes_level = dict(nodes_level),
+            nodes_cluster = dict(nodes_cluster),
+            nodes_parent = nodes_parent,
+            nodes_children = nodes_children,
+            nodes_count = nodes_count
         )
         
     def create_tree(self,node_datas):
         """
-        根据结构数据直接构建fp树
+        根据结构数据直接构建fp树，节点id会按层重新编号
         node_datas:一个字典结构数据，其形式与node_datas返回结果相同
         """
-        self._nodes_level = node_datas['nodes_level']
-        self._nodes_cluster = node_datas['nodes_cluster']
-        self._nodes_parent = node_datas['nodes_parent']
-        self._nodes_children = node_datas['nodes_children']
-        self._nodes_count = node_datas['nodes_count']
+        reverse = self._reverse
+        self.__init__(reverse=reverse)
+        node_to_item = dict((v,k) for k,vs in node_datas['nodes_cluster'].items() for v in vs)
+        nodes_parent = node_datas['nodes_parent']
+        nodes_count = node_datas['nodes_count']
+        levels = sorted(node_datas['nodes_level'].items(),key=lambda kv: int(kv[0][3:]))
+        new_ids = {}
+        for level,nodes in levels:
+            for node in sorted(nodes):
+                if nodes_parent.get(node) is None:
+                    new_ids[node] = 0
+                    continue
+                new_node = self._new_node(self._item_code(node_to_item[node]),new_ids[nodes_parent[node]])
+                self._count[new_node] = nodes_count[node]
+                self._item_counts[self._item[new_node]] += nodes_count[node]
+                new_ids[node] = new_node
         
-    def add(self,transaction):
+    def add(self,transaction,count=1):
         """
         逐条添加
+        count: 该条数据的计数，默认为1
         """
-        last_node = 0
-        for i,item in enumerate(transaction):
-            node = self._nodes_cluster[item].intersection(self._nodes_children[last_node])
-            if node:
-                node = list(node)[0]
-                self._nodes_count[node] += 1
-            else:
-                node = self._next_node
-                self._nodes_level['lv_%s' % (i+1)].add(node)
-                self._nodes_cluster[item].add(node)
-                self._nodes_parent[node] = last_node
-                self._nodes_children[last_node].add(node)
-                self._nodes_count[node] += 1
-            last_node = node
-    def adds(self,transactions,support=1):
+        node = 0
+        for item in transaction:
+            code = self._item_code(item)
+            child = self._find_child(node,code)
+            if child < 0:
+                child = self._new_node(code,node)
+            self._count[child] += count
+            self._item_counts[code] += count
+            node = child
+    def adds(self,transactions,support=1,item_counts=None):
         """
         输入数据条目，生长fp树
         transactions: 双层python链表，内嵌层每一项元素代表一条数据
         support:项的最小支持度
+        item_counts: 可选的{项:出现次数}，给出时不再遍历数据计数，transactions只被遍历一次(可以是只读一次的流)
         """
-        items = defaultdict(lambda: 0)
-        for transaction in transactions:
-            for item in transaction:
-                assert item != 'root','数据当中不可存在root默认的根节点标识，尝试替换成其它标识后再进行'
-                items[item] += 1
+        if item_counts is None:
+            items = defaultdict(lambda: 0)
+            for transaction in transactions:
+                for item in transaction:
+                    assert item != 'root','数据当中不可存在root默认的根节点标识，尝试替换成其它标识后再进行'
+                    items[item] += 1
+        else:
+            items = item_counts
         items = dict((item, spt) for item, spt in items.items() if spt >= support)
         self.item_list = [k for k in items.keys()]
         self.item_list.sort(key=lambda k: items[k],reverse=self._reverse)
         self.item_list.append(None)  # 添加虚拟待检查节点，使fp全树的频繁项集查找和子图统一
+        # 项在item_list中的位置，数据按该顺序生长，使树中路径的项顺序与item_list一致
+        position = dict((item,i) for i,item in enumerate(self.item_list))
         def clean_transaction(transaction):
-            transaction = filter(lambda v: v in items, transaction)
-            transaction_list = list(transaction)
-            transaction_list.sort(key=lambda v: self.item_list[::-1].index(v), reverse=self._reverse)
+            transaction_list = [v for v in transaction if v in items]
+            transaction_list.sort(key=lambda v: position[v])
             return transaction_list
         for transaction in map(clean_transaction,transactions):
             self.add(transaction)
+
+    def nodes(self,item):
+        """按节点链依次返回某一项的所有节点"""
+        code = self._item_index.get(item)
+        node = -1 if code is None else self._heads[code]
+        node_link = self._node_link
+        while node >= 0:
+            yield node
+            node = node_link[node]
+
+    def clear(self):
+        """释放所有节点，item_list保持不变"""
+        self.__init__(reverse=self._reverse)
+
+    @property
+    def nbytes(self):
+        """节点数组与项索引占用的字节数(近似)"""
+        arrays = (self._item,self._count,self._parent,self._first_child,self._next_sibling,self._node_link,
+                  self._depth,self._heads,self._tails,self._item_counts)
+        return sum(sys.getsizeof(a) for a in arrays) + sys.getsizeof(self._root_children)\
+               + sys.getsizeof(self._item_index)
+
+    def item_count(self,item):
+        """某一项在树中的总计数"""
+        code = self._item_index.get(item)
+        return 0 if code is None else self._item_counts[code]
+
+    def prefix_path(self,node):
+        """从root之后的第一个节点到node(含)路径上的项"""
+        path = []
+        parent,item,items = self._parent,self._item,self._items
+        while node > 0:
+            path.append(items[item[node]])
+            node = parent[node]
+        path.reverse()
+        return path
             
     @property
     def _next_node(self):
         """
         返回下一个节点id号，每一个节点有一个唯一的id号,root节点id=0
         """
-        return max(self._nodes_parent) + 1
+        return len(self._item)
     @property
     def maxdepth(self):
         """排除根节点树结构的最大深度"""
-        return len(self._nodes_level) - 1
+        return self._maxdepth
     @property
     def node_num(self):
         """排除根节点树的节点总数"""
-        return len(self._nodes_parent) - 1
+        return len(self._item) - 1
         
 def find_child_tree(tree,item,node_to_item=None):
     """
     根据结尾项从源树获取子树，使子树的叶节点均含有类型相同的项
     tree: 源树
     item: 子树的叶节点类型
-    node_to_item: 一个从节点到节点类型的映射字典，如果为None自动查找
+    node_to_item: 兼容旧版本保留的参数，不再使用
     """
-    nodes_cluster = tree.node_datas['nodes_cluster']
-    nodes_parent = tree.node_datas['nodes_parent']
-    nodes_count = tree.node_datas['nodes_count']
-    if node_to_item is None:
-        node_to_item = dict((v,k) for k,vs in nodes_cluster.items() for v in vs)
-    leaf_nodes = nodes_cluster[item]
-    
-    child_tree = FPTree()
-    new_node_datas = dict(
-            nodes_level = defaultdict(lambda: set()),
-            nodes_cluster = defaultdict(lambda: set()),
-            nodes_parent = defaultdict(lambda: None),
-            nodes_children = defaultdict(lambda: set()),
-            nodes_count = defaultdict(lambda: 0)
-    )
-    for node in leaf_nodes:
-        nodes = [node]
-        while node:
-            node = nodes_parent[node]
-            nodes.append(node)
-        for i,node in enumerate(nodes):
-            new_node_datas['nodes_level']['lv_%s' % (len(nodes) - nodes.index(node)-1)].add(node)
-            new_node_datas['nodes_cluster'][node_to_item[node]].add(node)
-            new_node_datas['nodes_parent'][node] = nodes_parent[node]
-            if node > 0:
-                new_node_datas['nodes_children'][nodes_parent[node]].add(node)
-                new_node_datas['nodes_count'][node] += nodes_count[nodes[0]]
-            else:
-                new_node_datas['nodes_count'][node] = None
-    child_tree.create_tree(new_node_datas)
-    child_tree._reverse = tree._reverse
-    child_tree.item_list = [item for item in tree.item_list if item in child_tree._nodes_cluster]
+    child_tree = FPTree(reverse=tree._reverse)
+    for node in tree.nodes(item):
+        child_tree.add(tree.prefix_path(node),tree._count[node])
+    child_tree.item_list = [i for i in tree.item_list if i in child_tree._item_index]
     return child_tree
 
-def find_counts(tree,minimum_support,node_to_item=None):
+def pattern_base(tree,item):
+    """
+    根据结尾项获取条件模式基，只沿该项的节点链与父节点指针读取源树，不复制源树
+    返回: [(路径上的项(从root之后开始,不含结尾项),计数),...]
+    """
+    parent,item_codes,counts,items = tree._parent,tree._item,tree._count,tree._items
+    base = []
+    for node in tree.nodes(item):
+        count = counts[node]
+        path = []
+        node = parent[node]
+        while node > 0:
+            path.append(items[item_codes[node]])
+            node = parent[node]
+        path.reverse()
+        base.append((path,count))
+    return base
+
+def tree_from_pattern_base(base,item_list,minimum_support,reverse=True):
+    """
+    根据条件模式基构建条件fp树，条件模式基中非频繁的项不进入条件树
+    base: pattern_base的返回结果
+    item_list: 源树的item_list，用于确定条件树的item_list
+    """
+    item_counts = defaultdict(lambda: 0)
+    for path,count in base:
+        for item in path:
+            item_counts[item] += count
+    child_tree = FPTree(reverse=reverse)
+    for path,count in base:
+        child_tree.add([item for item in path if item_counts[item] >= minimum_support],count)
+    child_tree.item_list = [i for i in item_list if i in child_tree._item_index]
+    child_tree.item_list.append(None)
+    return child_tree
+
+def project_tree(tree,item,minimum_support):
+    """
+    根据结尾项从源树投影出条件fp树(不含结尾项本身)
+    tree: 源树
+    item: 结尾项
+    minimum_support: 支持度
+    """
+    return tree_from_pattern_base(pattern_base(tree,item),tree.item_list,minimum_support,tree._reverse)
+
+def count_pattern_base(base,item_list,minimum_support,reverse=True,collect_stats=False,memory_limit=None):
+    """
+    由条件模式基构建条件树并递归查找，供并行时在子进程中执行
+    返回: (find_counts形式的结果,搜索的计数统计(collect_stats为False时为None))
+    """
+    stats = {} if collect_stats else None
+    tree = tree_from_pattern_base(base,item_list,minimum_support,reverse)
+    incr(stats,'conditional_trees')
+    return find_counts(tree,minimum_support,stats=stats,depth=1,memory_limit=memory_limit),stats
+
+def find_counts(tree,minimum_support,node_to_item=None,n_jobs=None,executor=None,stats=None,depth=0,
+                memory_limit=None):
     """
     从树结构当中递归查找频繁项的统计值，即支持度。
     返回结果是一个层叠的字典
     tree: fp树
     minimum_support: 支持度
-    node_to_item: 一个从节点到节点类型的映射字典，如果为None自动查找
+    node_to_item: 兼容旧版本保留的参数，不再使用
+    n_jobs: 进程数，指定(或指定executor)时源树每一个频繁项的条件模式基在子进程中查找，-1表示使用全部cpu
+    executor: 可选的concurrent.futures.Executor
+    stats: 可选的统计字典(见instrument)，记录条件树的数量conditional_trees与最大递归深度recursion_depth
+    depth: tree所在的递归深度，源树为0
+    memory_limit: 可选的内存预算(字节)，递归中仍在内存中的树的总大小超过预算时，当前条件树所有频繁项的条件模式基
+                  写入磁盘，该树随即清空(tree本身也可能被清空)，之后逐个读回查找(见spill)。并行时每个子进程各自遵守该预算
     """
-    if node_to_item is None:
-        node_to_item = dict((v,k) for k,vs in tree.node_datas['nodes_cluster'].items() for v in vs)
-    def get_count(tree,item):
-        return sum(tree.node_datas['nodes_count'][node] for node in tree.node_datas['nodes_cluster'][item])
-    def find_trees_count(tree):
-        trees = []
+    def find_trees_count(tree,depth):
+        maximum(stats,'recursion_depth',depth)
+        nbytes = 0 if spill is None else tree.nbytes
+        if spill is not None and spill.acquire(nbytes):
+            return spill_trees_count(tree,depth,nbytes)
+        counts = {}
         for item in tree.item_list[-2::-1]:
-            child_tree = find_child_tree(tree,item,node_to_item)
-            if get_count(tree,item) >= minimum_support:
-                trees.append(child_tree)
-            else:
-                None 
-        return {tr.item_list[-1]:(
-            get_count(tr,tr.item_list[-1]),
-            find_trees_count(tr)
-            ) for tr in trees
-            }
-    return find_trees_count(tree)
+            # 先检查支持度，满足时才投影条件树
+            count = tree.item_count(item)
+            if count >= minimum_support:
+                incr(stats,'conditional_trees')
+                counts[item] = (count,find_trees_count(project_tree(tree,item,minimum_support),depth+1))
+        if spill is not None:
+            spill.release(nbytes)
+        return counts
+    def spill_trees_count(tree,depth,nbytes):
+        # 超出内存预算：先将所有频繁项的条件模式基写入磁盘并清空当前树，再逐个读回、构建条件树并查找
+        item_list = tree.item_list
+        spilled = []
+        for item in item_list[-2::-1]:
+            count = tree.item_count(item)
+            if count >= minimum_support:
+                spilled.append((item,count,spill.write(pattern_base(tree,item))))
+        spill.release(nbytes)
+        tree.clear()
+        counts = {}
+        for item,count,path in spilled:
+            incr(stats,'conditional_trees')
+            child_tree = tree_from_pattern_base(spill.read(path),item_list,minimum_support,tree._reverse)
+            counts[item] = (count,find_trees_count(child_tree,depth+1))
+        return counts
+    if not is_parallel(n_jobs,executor):
+        if memory_limit is None:
+            spill = None
+            return find_trees_count(tree,depth)
+        with ProjectedDatabases(memory_limit,stats=stats) as spill:
+            return find_trees_count(tree,depth)
+    items,tasks,sizes = [],[],[]
+    for item in tree.item_list[-2::-1]:
+        count = tree.item_count(item)
+        if count >= minimum_support:
+            base = pattern_base(tree,item)
+            items.append((item,count))
+            tasks.append((base,tree.item_list,minimum_support,tree._reverse,stats is not None,memory_limit))
+            sizes.append(sum(len(path) for path,_ in base))
+    results = map_tasks(count_pattern_base,tasks,sizes,n_jobs,executor)
+    for _,task_stats in results:
+        merge(stats,task_stats)
+    return dict((item,(count,result)) for (item,count),(result,_) in zip(items,results))
+
+def find_top_k(tree,top,stats=None,suffix=[]):
+    """
+    将树中的频繁项集(均加上后缀suffix)放入topk.TopK对象top，按支持度降序检查各项，使阈值尽早上升，
+    条件树以当前阈值投影
+    """
+    maximum(stats,'recursion_depth',len(suffix))
+    counts = sorted(((tree.item_count(item),item) for item in tree.item_list[:-1]),key=lambda ci: -ci[0])
+    for count,item in counts:
+        if count < top.threshold: # 其余的项支持度更低
+            break
+        itemset = [item] + suffix
+        top.push(itemset,count)
+        incr(stats,'conditional_trees')
+        find_top_k(project_tree(tree,item,top.threshold),top,stats,itemset)
 
 def find_frequent_itemsets_alpha(cnt):
     """解析find_count结果，生成频繁项集"""
@@ -194,18 +399,44 @@ def find_frequent_itemsets_alpha(cnt):
     find_itemsets(cnt)
     return itemsets
 
-def find_frequent_itemsets(datas,minimum_support,reverse=True):
+def find_frequent_itemsets(datas,minimum_support,reverse=True,n_jobs=None,executor=None,stats=None,
+                           top_k=None,min_length=1,memory_limit=None):
     """
     基于给定的支持度，查找频繁项集
-    datas: 双层python链表，每一项元素代表一条数据
+    datas: 双层python链表，每一项元素代表一条数据，也可以是codec.Transactions或stream.TransactionSource，
+           后者分两次逐块读取(计数、建树)，不在内存中保存数据
     minimum_support: 支持度
     reverse: 指定树生长时的排序方式，默认从高频项到低频项，也可反转（False）
+    n_jobs: 进程数，-1表示使用全部cpu，默认不并行
+    executor: 可选的concurrent.futures.Executor
+    stats: 可选的字典或instrument.MiningStats，记录各阶段(count,encode,build,mine)的耗时'time'、
+           fp树的节点数tree_nodes与深度tree_depth、条件树的数量conditional_trees与最大递归深度recursion_depth
+    top_k: 指定时只返回支持度计数最大的top_k个长度不小于min_length的频繁项集(与第top_k个支持度相同的一并返回)，
+           按支持度降序排列；minimum_support可以为None，否则作为支持度下限；支持度阈值在查找中动态上升，不并行
+    min_length: top_k模式下项集的最小长度
+    memory_limit: 可选的fp树(含源树)内存预算(字节)，超出时条件模式基写入磁盘后逐个读回查找，见find_counts与spill；
+                  top_k模式下不使用
     """
-    tree = FPTree(reverse=reverse)
-    tree.adds(datas,support=minimum_support)
-    node_to_item = dict((v,k) for k,vs in tree.node_datas['nodes_cluster'].items() for v in vs)
-    counts = find_counts(tree,minimum_support,node_to_item)
-    return find_frequent_itemsets_alpha(counts)
+    codec,datas = encode_source(datas,stats) # 在项的编码id上建树与查找，输出时再解码
+    if top_k is not None:
+        top = TopK(top_k,minimum_support,min_length)
+        top.bound(codec.counts) # 第k大的单个项支持度计数是阈值的下界
+        minimum_support = top.threshold
+    with phase(stats,'build'):
+        tree = FPTree(reverse=reverse)
+        tree.adds(datas,support=minimum_support,item_counts=dict(enumerate(codec.counts.tolist())))
+    if stats is not None:
+        stats['tree_nodes'] = tree.node_num
+        stats['tree_depth'] = tree.maxdepth
+    with phase(stats,'mine'):
+        if top_k is not None:
+            find_top_k(tree,top,stats)
+            itemsets = top.result()
+        else:
+            counts = find_counts(tree,minimum_support,n_jobs=n_jobs,executor=executor,stats=stats,
+                                 memory_limit=memory_limit)
+            itemsets = find_frequent_itemsets_alpha(counts)
+    return codec.decode_itemsets(itemsets)
 
 try:
     import networkx as nx
@@ -218,7 +449,7 @@ try:
         add_labels: 添加节点类型与计数标签
         """
         node_datas = tree.node_datas
-        node_to_item = dict((v,k) for k,vs in tree._nodes_cluster.items() for v in vs)
+        node_to_item = dict((v,k) for k,vs in node_datas['nodes_cluster'].items() for v in vs)
         depth = tree.maxdepth
         max_width = max(len(nodes)for nodes in node_datas['nodes_level'].values())
         graph = nx.Graph()
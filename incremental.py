@@ -0,0 +1,117 @@
+# encoding: utf-8
+"""
+面向只追加数据流的增量fp-growth：fp树保存所有项(包括当前非频繁的项)，项的顺序在批次之间保持稳定，
+新批次到来后只对项顺序发生逆转的分支重新排序(分支排序法,参考CP-tree)，随后直接在树上查找频繁项集，无需重读历史数据
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+from fp_growth import FPTree,find_with_suffix
+
+class IncrementalFPGrowth(object):
+    """
+    增量挖掘对象
+    用法:
+        miner = IncrementalFPGrowth(minimum_support)
+        itemsets = miner.update(batch)
+    """
+    def __init__(self,minimum_support):
+        """
+        minimum_support: >= 1的整数时代表支持度计数;1.0 >= minimum_support >= 0.0 且为float时代表相对于已接收数据条目数的支持度
+        """
+        self.minimum_support = minimum_support
+        self.tree = FPTree()
+        self.size = 0 # 已接收的数据条目数
+        self.counts = {} # 所有项的计数
+        self._rank = {} # 项在树中的顺序，计数降序，计数相同时保持原有顺序
+        self.restructured = 0 # 累计重新排序的子树数
+
+    @property
+    def support_count(self):
+        """当前的支持度计数阈值"""
+        if type(self.minimum_support) == float and 0 <= self.minimum_support <= 1:
+            return self.size * self.minimum_support
+        return self.minimum_support
+
+    def update(self,batch):
+        """
+        追加一批数据并返回更新后的频繁项集[(项集,支持度计数),...]
+        batch: 类双层python链表，每一项元素代表一条数据
+        """
+        batch = [list(transaction) for transaction in batch]
+        counts = self.counts
+        for transaction in batch:
+            for item in transaction:
+                counts[item] = counts.get(item,0) + 1
+        self.size += len(batch)
+
+        old_rank = self._rank
+        order = sorted(counts,key=lambda item: (-counts[item],old_rank.get(item,len(old_rank))))
+        rank = self._rank = dict((item,i) for i,item in enumerate(order))
+
+        self._restructure(self._inverted_items(old_rank,rank))
+        for transaction in batch:
+            self.tree.add(sorted(transaction,key=rank.__getitem__))
+        return self.frequent_itemsets()
+
+    def frequent_itemsets(self):
+        """在当前树上查找频繁项集[(项集,支持度计数),...]"""
+        return list(find_with_suffix(self.tree,[],self.support_count))
+
+    @staticmethod
+    def _inverted_items(old_rank,rank):
+        """
+        返回新旧顺序下相对先后发生逆转的已有项：按旧顺序排列后，
+        某一项之前存在新顺序更靠后的项，或之后存在新顺序更靠前的项
+        """
+        items = sorted(old_rank,key=old_rank.__getitem__)
+        new = [rank[item] for item in items]
+        inverted = set()
+        prefix_max = -1
+        for item,r in zip(items,new):
+            if prefix_max > r:
+                inverted.add(item)
+            prefix_max = max(prefix_max,r)
+        suffix_min = len(new)
+        for item,r in zip(reversed(items),reversed(new)):
+            if suffix_min < r:
+                inverted.add(item)
+            suffix_min = min(suffix_min,r)
+        return inverted
+
+    def _restructure(self,inverted):
+        """
+        找出包含顺序逆转的父子节点的路径，取出路径上最高的inverted项节点的子树，按新顺序重新插入其父节点之下
+        路径上任意相邻两项都满足新顺序时路径即满足新顺序，逆转的父子节点两项必然都在inverted中；
+        不在inverted中的项与其它所有项的相对顺序不变，因此最高的inverted项节点之上的路径仍排在子树的所有项之前
+        """
+        tree,rank = self.tree,self._rank
+        subtrees = set()
+        for item in inverted:
+            for node in tree.nodes(item):
+                parent = node.parent
+                if parent.root or rank[parent.item] < rank[item]:
+                    continue
+                top = parent
+                while not parent.root:
+                    if parent.item in inverted:
+                        top = parent
+                    parent = parent.parent
+                subtrees.add(top)
+        # 某一子树位于另一子树之内时只需取出外层子树
+        outermost = []
+        for node in subtrees:
+            parent = node.parent
+            while not parent.root and parent not in subtrees:
+                parent = parent.parent
+            if parent.root:
+                outermost.append(node)
+        # 先全部取出再插入，避免插入的路径并入尚未取出的子树；各子树一次取出，项的节点链只重建一次
+        parents = [node.parent for node in outermost]
+        for parent,paths in zip(parents,tree._detach(*outermost)):
+            for path,count in paths:
+                tree._insert(parent,sorted(path,key=rank.__getitem__),count)
+        self.restructured += len(outermost)
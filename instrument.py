@@ -0,0 +1,105 @@
+# encoding: utf-8
+"""
+挖掘过程的统计：各阶段耗时与搜索空间计数。
+各算法的find_frequent_itemsets与rule.find_rules接受可选的stats参数，可以是普通字典或MiningStats，
+统计结果写入其中：
+    stats['time']: {阶段名:秒数}，阶段包括count(项计数),encode(编码),build(建树/矩阵),mine(挖掘),rules(规则生成)
+    其余键为计数，如candidates(apriori每一轮的候选项集数),tree_nodes,tree_depth,conditional_trees,
+    recursion_depth,rules_tested,rules_emitted等
+stats为None时下列函数均不做任何事
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import time
+from contextlib import contextmanager
+
+# 合并统计结果时取最大值而不是求和的计数
+MAXIMUM_KEYS = frozenset(['tree_depth','recursion_depth'])
+
+class MiningStats(dict):
+    """
+    记录挖掘统计的字典
+    callback: 可选的函数callback(阶段名,秒数)，每个阶段结束时调用
+    """
+    def __init__(self,callback=None):
+        super().__init__()
+        self.callback = callback
+        self['time'] = {}
+
+    def report(self):
+        """返回便于阅读的统计文本"""
+        lines = ['%-10s %.6fs' % (name,seconds) for name,seconds in self['time'].items()]
+        lines += ['%-10s %s' % (name,value) for name,value in self.items() if name != 'time']
+        return '\n'.join(lines)
+
+def add_time(stats,name,seconds):
+    """将耗时累加到阶段name"""
+    if stats is None:
+        return
+    times = stats.setdefault('time',{})
+    times[name] = times.get(name,0.0) + seconds
+    callback = getattr(stats,'callback',None)
+    if callback is not None:
+        callback(name,seconds)
+
+@contextmanager
+def phase(stats,name):
+    """with phase(stats,name): 统计with语句块的耗时"""
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(stats,name,time.perf_counter() - start)
+
+def timed(stats,name,iterable):
+    """逐个产出iterable的元素，只把生成元素的耗时(不含使用者处理元素的时间)累加到阶段name"""
+    if stats is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            yield value
+    finally:
+        add_time(stats,name,elapsed)
+
+def incr(stats,name,n=1):
+    """计数name增加n"""
+    if stats is not None:
+        stats[name] = stats.get(name,0) + n
+
+def maximum(stats,name,value):
+    """计数name取其与value的较大值"""
+    if stats is not None and value > stats.get(name,0):
+        stats[name] = value
+
+def merge(stats,other):
+    """将other(如子进程返回的统计)合并到stats：耗时与计数求和，MAXIMUM_KEYS取最大值，链表拼接"""
+    if stats is None or not other:
+        return
+    for name,value in other.items():
+        if name == 'time':
+            times = stats.setdefault('time',{})
+            for phase_name,seconds in value.items():
+                times[phase_name] = times.get(phase_name,0.0) + seconds
+        elif isinstance(value,list):
+            stats.setdefault(name,[]).extend(value)
+        elif name in MAXIMUM_KEYS:
+            maximum(stats,name,value)
+        else:
+            incr(stats,name,value)
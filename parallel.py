@@ -0,0 +1,38 @@
+# encoding: utf-8
+"""
+多进程并行执行的辅助函数，供fp_growth,fp_growth2等模块按任务划分后并行挖掘
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+def is_parallel(n_jobs=None,executor=None):
+    """是否需要并行执行：指定了executor，或n_jobs不为None与1"""
+    return executor is not None or (n_jobs is not None and n_jobs != 1)
+
+def map_tasks(func,tasks,sizes,n_jobs=None,executor=None):
+    """
+    并行执行func(*task)，任务按sizes从大到小的顺序提交以平衡各进程负载，结果按tasks的原顺序返回
+    func: 模块级函数(须可被pickle)
+    tasks: 参数元组链表
+    sizes: 每个任务的工作量估计
+    n_jobs: 进程数，-1表示使用全部cpu
+    executor: 可选的concurrent.futures.Executor，指定时不再创建进程池，且不会被关闭
+    """
+    order = sorted(range(len(tasks)),key=lambda i: sizes[i],reverse=True)
+    own_executor = executor is None
+    if own_executor:
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = os.cpu_count()
+        executor = ProcessPoolExecutor(max_workers=n_jobs)
+    try:
+        futures = dict((i,executor.submit(func,*tasks[i])) for i in order)
+        return [futures[i].result() for i in range(len(tasks))]
+    finally:
+        if own_executor:
+            executor.shutdown()
@@ -0,0 +1,145 @@
+# encoding: utf-8
+"""
+SON(Savasere-Omiecinski-Navathe)分区算法：数据按条目划分为若干块，两次扫描得到与整体挖掘完全相同的频繁项集。
+第一次扫描在每个块上以按块大小缩放的支持度计数挖掘局部频繁项集(可用apriori,fp_growth,fp_growth2,eclat)，
+整体频繁的项集至少在一个块中局部频繁，因此所有局部结果的并集即为候选项集；
+第二次扫描在每个块上以位图精确统计候选项集的支持度计数，求和后按minimum_support筛选。
+两次扫描中各块相互独立，通过parallel.map_tasks在进程池中执行，内存占用由块的大小而不是整个数据决定。
+用法:
+    itemsets = partition.find_frequent_itemsets(fp_growth2.find_frequent_itemsets,datas,100,n_partitions=8,n_jobs=4)
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import inspect
+import math
+import os
+
+import numpy as np
+
+from codec import Transactions,encode_transactions
+from eclat import gen_bitsets,popcount
+from instrument import incr,phase
+from parallel import is_parallel,map_tasks
+from stream import TransactionSource
+
+def split_transactions(data,n_partitions):
+    """将CSR数据按条目均分为n_partitions块，返回[(offsets,items),...]，每块的offsets从0开始"""
+    bounds = np.linspace(0,len(data),n_partitions+1).astype(np.int64)
+    partitions = []
+    for start,stop in zip(bounds[:-1],bounds[1:]):
+        if stop > start:
+            offsets = data.offsets[start:stop+1]
+            partitions.append((offsets - offsets[0],data.items[offsets[0]:offsets[-1]]))
+    return partitions
+
+def _partitions(transactions,n_partitions,stats=None):
+    """
+    编码数据并分块：stream.TransactionSource按其数据块分块，其它数据编码后均分为n_partitions块
+    返回: (ItemCodec,每个项的支持度计数,[(offsets,items),...])
+    """
+    if isinstance(transactions,TransactionSource):
+        codec = transactions.count_items(stats)
+        partitions = []
+        with phase(stats,'encode'):
+            for chunk in transactions.chunks():
+                ids = [codec.encode(transaction) for transaction in chunk]
+                offsets = np.zeros(len(ids)+1,dtype=np.int64)
+                offsets[1:] = np.cumsum([len(transaction) for transaction in ids])
+                partitions.append((offsets,np.asarray([idx for transaction in ids for idx in transaction],dtype=np.int32)))
+        return codec,codec.counts,partitions
+    codec,data = encode_transactions(transactions,stats)
+    counts = codec.counts if codec.counts is not None else np.bincount(data.items,minlength=len(codec))
+    return codec,counts,split_transactions(data,n_partitions)
+
+def _drop_items(offsets,items,keep):
+    """去掉keep[id]为False的项(整体不频繁的项不可能出现在频繁项集中)"""
+    mask = keep[items]
+    kept = np.concatenate([[0],np.cumsum(mask,dtype=np.int64)])
+    return kept[offsets],items[mask]
+
+def local_support(minimum_support,partition_size,transactions_size):
+    """
+    块的局部支持度计数：整体支持度计数不低于minimum_support的项集，至少在一个块中的支持度计数不低于
+    minimum_support * 块大小 / 总数据数量；支持度计数为整数，向下取整不影响正确性
+    """
+    return max(math.floor(minimum_support * partition_size / transactions_size),1)
+
+def mine_partition(find_func,offsets,items,minimum_support,kargs):
+    """第一次扫描：挖掘一个块的局部频繁项集，返回[(项id,...),...]，每个项集内id升序"""
+    # 不带codec的Transactions会被各算法当作普通数据重新编码，项即为全局id
+    data = Transactions(offsets,items)
+    candidates = []
+    for itemset,_ in find_func(data,minimum_support,**kargs):
+        candidates.append(tuple(sorted(int(item) for item in itemset)))
+    return candidates
+
+def count_partition(offsets,items,codec,candidates):
+    """
+    第二次扫描：以位图统计一个块中候选项集的支持度计数，返回与candidates对应的int64数组
+    candidates按字典序排列且向下闭包(每个候选项集去掉最后一项后仍是候选项集，且排在它之前)，
+    因此只需保留当前候选项集各前缀的位图栈，每个候选项集由其前缀的位图与最后一项的位图按位与得到
+    """
+    bitsets,_,_ = gen_bitsets(Transactions(offsets,items,codec))
+    counts = np.empty(len(candidates),dtype=np.int64)
+    stack = []
+    for k,candidate in enumerate(candidates):
+        del stack[len(candidate)-1:]
+        bits = bitsets[candidate[-1]] if not stack else stack[-1] & bitsets[candidate[-1]]
+        counts[k] = popcount(bits)
+        stack.append(bits)
+    return counts
+
+def _run(func,tasks,sizes,n_jobs,executor):
+    if is_parallel(n_jobs,executor):
+        return map_tasks(func,tasks,sizes,n_jobs,executor)
+    return [func(*task) for task in tasks]
+
+def find_frequent_itemsets(find_func,transactions,minimum_support,n_partitions=None,n_jobs=None,executor=None,
+                           stats=None,**kargs):
+    """
+    以SON分区算法查找频繁项集，结果与find_func在整个数据上的结果相同
+    find_func: 局部挖掘算法，apriori,eclat,fp_growth2,fp_growth模块下的find_frequent_itemsets(须为模块级函数以便pickle)
+    transactions: 类双层python链表、codec.Transactions或stream.TransactionSource(按其数据块分块)
+    minimum_support: 支持度计数，或1.0 >= minimum_support >= 0.0的float支持度
+    n_partitions: 分块数，默认与进程数相同；块越小局部支持度计数越低，候选项集越多，局部支持度计数接近1时候选项集会急剧增加
+    n_jobs: 进程数，-1表示使用全部cpu，默认不并行(各块依次处理)
+    executor: 可选的concurrent.futures.Executor
+    stats: 可选的统计字典，记录partitions(块数)、candidates(候选项集数)与local(第一次扫描)、verify(第二次扫描)的耗时
+    kargs: 传给find_func的其它参数；apriori的mini模式，以及闭项集、最大频繁项集与top-k的局部结果不能合并，不支持
+    返回: [([项,...],支持度计数),...]
+    """
+    if kargs.get('mode') == 'mini' or kargs.get('closed') or kargs.get('maximal') or kargs.get('top_k') is not None:
+        raise ValueError('分区挖掘只支持普通的频繁项集挖掘')
+    if 'include_support' in inspect.signature(find_func).parameters:
+        kargs['include_support'] = True
+    if n_partitions is None:
+        n_partitions = os.cpu_count() if n_jobs is None or n_jobs < 0 else n_jobs
+    codec,counts,partitions = _partitions(transactions,n_partitions,stats)
+    transactions_size = sum(len(offsets) - 1 for offsets,_ in partitions)
+    if 0 <= minimum_support <= 1 and type(minimum_support) == float:
+        minimum_support = transactions_size * minimum_support
+    keep = counts >= minimum_support
+    partitions = [_drop_items(offsets,items,keep) for offsets,items in partitions]
+    sizes = [len(items) for _,items in partitions]
+    incr(stats,'partitions',len(partitions))
+
+    with phase(stats,'local'):
+        tasks = [(find_func,offsets,items,local_support(minimum_support,len(offsets)-1,transactions_size),kargs)\
+                 for offsets,items in partitions]
+        candidates = set()
+        for local in _run(mine_partition,tasks,sizes,n_jobs,executor):
+            candidates.update(local)
+        candidates = sorted(candidates)
+    incr(stats,'candidates',len(candidates))
+
+    with phase(stats,'verify'):
+        tasks = [(offsets,items,codec,candidates) for offsets,items in partitions]
+        supports = np.zeros(len(candidates),dtype=np.int64)
+        for local in _run(count_partition,tasks,sizes,n_jobs,executor):
+            supports += local
+    return [(codec.decode(candidate),int(sup)) for candidate,sup in zip(candidates,supports.tolist())\
+            if sup >= minimum_support]
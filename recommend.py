@@ -0,0 +1,140 @@
+# encoding: utf-8
+"""
+关联规则的在线推荐索引：输入购物篮，返回按度量排序的前N个后件项。
+规则按度量降序编号，以项id为键建立前件的倒排索引(CSR形式)；查询时取出购物篮中各项的倒排链拼接后统计
+每条规则命中的次数，命中次数等于前件长度的规则即被触发，规则编号本身就是排名，不需要对结果排序。
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import numpy as np
+
+from codec import ItemCodec
+
+class RuleIndex(object):
+    """
+    规则推荐索引
+    用法:
+        index = RuleIndex(rule.find_rules(itemsets,N,0.5),metric='lift')
+        index.recommend(basket,n=10)
+    """
+    def __init__(self,rules,metric='confidence',names=None,transactions_size=None):
+        """
+        rules: rule.find_rules的结果、rule.find_rules_batch返回的结构化数组或store.RuleTable
+        metric: 排序使用的度量，可以是度量列名(support,confidence,lift或自定义评价指标名)，
+                也可以是Evatn_func形式的函数f(count(AB),count(A),count(B),N)，此时需给出transactions_size，
+                计数由support,confidence,lift三列还原
+        names: find_rules结果的度量列名，默认为support,confidence,lift，使用了自定义评价指标时应给出全部列名
+        transactions_size: 总数据数量，metric为函数时使用
+        """
+        rules,names = self._normalize(rules,names)
+        columns = dict((name,np.asarray([rule[k+2] for rule in rules],dtype=np.float64))\
+                       for k,name in enumerate(names))
+        if callable(metric):
+            if transactions_size is None:
+                raise ValueError('metric为函数时需要给出transactions_size')
+            N = transactions_size
+            union = columns['support'] * N
+            left = union / columns['confidence']
+            right = union * N / (columns['lift'] * left)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                scores = np.asarray(metric(union,left,right,N),dtype=np.float64)
+        elif metric in columns:
+            scores = columns[metric]
+        else:
+            raise KeyError('规则中没有度量%r，可用的度量为%s' % (metric,list(columns)))
+        # 按度量降序重新编号，度量为nan的规则排在最后
+        order = np.argsort(-np.nan_to_num(scores,nan=-np.inf),kind='stable')
+        rules = [rules[idx] for idx in order]
+        self.scores = scores[order]
+        self.columns = dict((name,values[order]) for name,values in columns.items())
+
+        self.codec = codec = ItemCodec(dict.fromkeys(item for rule in rules for side in rule[:2] for item in side))
+        n_items = len(codec)
+        self.left_length = np.asarray([len(rule[0]) for rule in rules],dtype=np.int64)
+        # 后件以CSR形式保存
+        self.right_offsets = np.zeros(len(rules)+1,dtype=np.int64)
+        self.right_offsets[1:] = np.cumsum([len(rule[1]) for rule in rules])
+        self.right_items = np.asarray([idx for rule in rules for idx in codec.encode(rule[1])],dtype=np.int64)
+        # 前件的倒排索引: 项id -> 规则编号(升序，即按度量降序)
+        rule_ids = np.repeat(np.arange(len(rules),dtype=np.int64),self.left_length)
+        item_ids = np.asarray([idx for rule in rules for idx in codec.encode(rule[0])],dtype=np.int64)
+        order = np.argsort(item_ids,kind='stable')
+        self.postings = rule_ids[order]
+        self.posting_offsets = np.zeros(n_items+1,dtype=np.int64)
+        self.posting_offsets[1:] = np.cumsum(np.bincount(item_ids,minlength=n_items))
+
+    @staticmethod
+    def _normalize(rules,names):
+        """将各种形式的规则统一为tuple链表与度量列名"""
+        if isinstance(rules,np.ndarray) and rules.dtype.names:
+            names = list(rules.dtype.names[2:])
+            return [tuple(rule) for rule in rules],names
+        if hasattr(rules,'columns') and hasattr(rules,'left_offsets'): # store.RuleTable
+            return list(rules),list(rules.columns)
+        names = ['support','confidence','lift'] if names is None else list(names)
+        return list(rules),names
+
+    def __len__(self):
+        return len(self.left_length)
+
+    def _basket_ids(self,basket):
+        index = self.codec.index
+        return [index[item] for item in set(basket) if item in index]
+
+    def _fired(self,ids):
+        """返回购物篮(项id)触发的规则编号，升序即按度量降序"""
+        if not ids:
+            return self.postings[:0]
+        offsets = self.posting_offsets
+        hits = np.concatenate([self.postings[offsets[idx]:offsets[idx+1]] for idx in ids])
+        rule_ids,counts = np.unique(hits,return_counts=True)
+        return rule_ids[counts == self.left_length[rule_ids]]
+
+    def _top(self,fired,ids,n):
+        """按规则排名依次取出不在购物篮中的后件项，每个项的得分为推荐它的最好规则的度量"""
+        basket = set(ids)
+        seen = set()
+        result = []
+        offsets,right_items,scores,items = self.right_offsets,self.right_items,self.scores,self.codec.items
+        for rule_id in fired.tolist():
+            for idx in right_items[offsets[rule_id]:offsets[rule_id+1]].tolist():
+                if idx not in basket and idx not in seen:
+                    seen.add(idx)
+                    result.append((items[idx],float(scores[rule_id])))
+                    if len(result) >= n:
+                        return result
+        return result
+
+    def recommend(self,basket,n=10):
+        """
+        返回购物篮basket触发的规则中度量最高的前n个后件项[(项,度量),...]，购物篮中已有的项不再推荐
+        """
+        ids = self._basket_ids(basket)
+        return self._top(self._fired(ids),ids,n)
+
+    def rules_for(self,basket):
+        """返回购物篮触发的所有规则的编号(按度量降序)，可用于查看columns中的各度量"""
+        return self._fired(self._basket_ids(basket))
+
+    def recommend_batch(self,baskets,n=10):
+        """
+        批量查询：所有购物篮的倒排链拼接后以(购物篮,规则)为键一次统计命中次数
+        返回: 与baskets顺序相同的recommend结果链表
+        """
+        baskets = [self._basket_ids(basket) for basket in baskets]
+        offsets = self.posting_offsets
+        lengths = [offsets[idx+1] - offsets[idx] for ids in baskets for idx in ids]
+        if not lengths:
+            return [[] for _ in baskets]
+        hits = np.concatenate([self.postings[offsets[idx]:offsets[idx+1]] for ids in baskets for idx in ids])
+        labels = np.repeat(np.repeat(np.arange(len(baskets),dtype=np.int64),[len(ids) for ids in baskets]),lengths)
+        keys,counts = np.unique(labels * len(self) + hits,return_counts=True)
+        basket_idx,rule_ids = keys // len(self),keys % len(self)
+        fired = counts == self.left_length[rule_ids]
+        basket_idx,rule_ids = basket_idx[fired],rule_ids[fired]
+        bounds = np.searchsorted(basket_idx,np.arange(len(baskets)+1))
+        return [self._top(rule_ids[bounds[k]:bounds[k+1]],ids,n) for k,ids in enumerate(baskets)]
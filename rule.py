@@ -8,9 +8,16 @@
 __copyright__ = 'Copyright © 2022 ERSSLE'
 __license__ = 'MIT License'
 
+import time
+from collections import defaultdict
 from itertools import combinations
+import numpy as np
 from numpy import sqrt,log
 
+from apriori import gen_candidates
+from codec import ItemCodec
+from instrument import add_time,incr
+
 def find_support_from_itemsets(target_set,itemsets):
     """
     查找目标频繁项的支持度计数
@@ -30,7 +37,78 @@ def find_support_from_itemsets(target_set,itemsets):
                 break
     return target_sup
 
-def find_rules(itemsets,transactions_size,minimum_conf,minimum_lift=None,**evaluation_funcs):
+class MissingSupportError(KeyError):
+    """频繁项集中缺少某一子集的支持度计数，通常是因为输入的频繁项集不完整(不满足向下闭包)"""
+
+class SupportIndex(object):
+    """
+    频繁项集支持度计数的哈希索引，在挖掘结果上一次性建立：frozenset(项id) -> 支持度计数，
+    查询时间为O(1)(仅需对查询项集求哈希)
+    """
+    def __init__(self,itemsets,codec=None,closed=False):
+        """
+        itemsets: 频繁项集[(项集,支持度计数),...]
+        codec: 可选的codec.ItemCodec，为None时根据itemsets中出现的项创建
+        closed: itemsets是否为闭频繁项集(如fp_growth.find_frequent_itemsets(closed=True)的结果)，
+                为True时由闭项集恢复所有频繁项集的支持度计数
+        """
+        itemsets = list(itemsets)
+        if codec is None:
+            codec = ItemCodec(dict.fromkeys(item for itemset,_ in itemsets for item in itemset))
+        self.codec = codec
+        self._supports = dict((frozenset(codec.encode(itemset)),sup_count) for itemset,sup_count in itemsets)
+        if closed:
+            self._supports = self._expand_closed(self._supports)
+
+    @staticmethod
+    def _expand_closed(closed_supports):
+        """
+        频繁项集的支持度计数等于包含它的闭项集中最大的支持度计数：按支持度计数降序逐个展开闭项集的子集，
+        每个子集第一次出现时即得到其支持度计数；某一子集已出现过时，它的所有子集也已出现，不再展开
+        """
+        supports = {}
+        for itemset,sup_count in sorted(closed_supports.items(),key=lambda kv: -kv[1]):
+            level = [itemset] if itemset not in supports else []
+            while level:
+                next_level = set()
+                for subset in level:
+                    supports[subset] = sup_count
+                for subset in level:
+                    if len(subset) > 1:
+                        next_level.update(child for child in (subset - {item} for item in subset)\
+                                          if child not in supports)
+                level = list(next_level)
+        return supports
+
+    def __len__(self):
+        return len(self._supports)
+
+    def __contains__(self,itemset):
+        return frozenset(self.codec.encode(itemset)) in self._supports
+
+    def items(self):
+        """按输入顺序返回(frozenset(项id),支持度计数)"""
+        return self._supports.items()
+
+    def get(self,ids):
+        """
+        查询编码后项集的支持度计数
+        ids: frozenset(项id)
+        不存在时抛出MissingSupportError
+        """
+        try:
+            return self._supports[ids]
+        except KeyError:
+            raise MissingSupportError('频繁项集中缺少%s的支持度计数' % sorted(self.codec.decode(ids),key=str)) from None
+
+    def support(self,itemset):
+        """查询项集(未编码)的支持度计数，不存在时抛出MissingSupportError"""
+        ids = self.codec.encode(itemset)
+        if len(ids) < len(set(itemset)):
+            raise MissingSupportError('频繁项集中缺少%s的支持度计数' % sorted(itemset,key=str))
+        return self.get(frozenset(ids))
+
+def find_rules(itemsets,transactions_size,minimum_conf,minimum_lift=None,stats=None,closed=False,**evaluation_funcs):
     """
     根据频繁项集对关联规则的发掘
     itemsets: 频繁项集
@@ -40,28 +118,40 @@ def find_rules(itemsets,transactions_size,minimum_conf,minimum_lift=None,**evalu
     evaluation_funcs: 可自定义的关联规则评价函数，函数必须定义四个位置参数，即便某些不用。在形如A——>B的规则当中：
     四个参数分别指: count(AB),count(A),count(B),count(itemsets)
     常用评估函数可查看Evatn_func
+    stats: 可选的字典或instrument.MiningStats，记录规则生成的耗时'rules'(不含使用者处理每条规则的时间)、
+           计算了置信度的规则数rules_tested与输出的规则数rules_emitted
+    closed: itemsets为闭频繁项集时设为True，由闭项集恢复子集的支持度计数，产生的规则与使用全部频繁项集时相同
     函数返回：
         (X,Y,support,confidence,lift,[自定义的评价指标])
+    itemsets中缺少某一规则前件或后件的支持度计数时抛出MissingSupportError
     """
     evaluation_funcs = list(evaluation_funcs.items())
     funcs_length = len(evaluation_funcs)
     print('return column names：\n 前件——>后件: support,confidence,lift'+',%s'*funcs_length\
          % tuple([func[0] for func in evaluation_funcs]))
     print()
-    for itemset in itemsets:
+    # 在项的编码id上生成规则，支持度计数通过哈希索引查询，输出时再解码
+    # 后件逐层生长(ap-genrules)：X——>Y不满足最小置信度时，同一项集中后件包含Y的规则置信度更低，不再尝试
+    start = time.perf_counter()
+    index = SupportIndex(itemsets,closed=closed)
+    codec = index.codec
+    for itemset in list(index.items()):
         itemset,sup_count = itemset
-        itemset = set(itemset)
         
         length_itemset = len(itemset)
-        for size in range(1,length_itemset):
-            for left in combinations(itemset,size):
-                left = set(left)
-                right = itemset.difference(left)
-                left_sup_count = find_support_from_itemsets(left,itemsets)
+        consequents = [(item,) for item in sorted(itemset)]
+        while consequents and len(consequents[0]) < length_itemset:
+            passed = []
+            for consequent in consequents:
+                right = frozenset(consequent)
+                left = itemset.difference(right)
+                left_sup_count = index.get(left)
                 conf = Evatn_func.conf(sup_count,left_sup_count,None,transactions_size)
+                incr(stats,'rules_tested')
                 if conf >= minimum_conf:
+                    passed.append(consequent)
                     # 计算置信度与提升度
-                    right_sup_count = find_support_from_itemsets(right,itemsets)
+                    right_sup_count = index.get(right)
                     sup = Evatn_func.sup(sup_count,left_sup_count,right_sup_count,transactions_size)
                     lift = Evatn_func.lift(sup_count,left_sup_count,right_sup_count,transactions_size)
                     others = [
@@ -69,38 +159,128 @@ def find_rules(itemsets,transactions_size,minimum_conf,minimum_lift=None,**evalu
                              for func in evaluation_funcs
                     ]
                     if minimum_lift is None or lift >= minimum_lift:
-                        yield tuple([left,right,sup,conf,lift] + others)
+                        incr(stats,'rules_emitted')
+                        rule = tuple([set(codec.decode(left)),set(codec.decode(right)),sup,conf,lift] + others)
+                        add_time(stats,'rules',time.perf_counter() - start)
+                        yield rule
+                        start = time.perf_counter()
+            # 由通过检查的后件合并产生长度+1的候选后件
+            consequents = gen_candidates(passed)[0]
+    add_time(stats,'rules',time.perf_counter() - start)
+
+def _evaluate_batch(func,union_counts,left_counts,right_counts,N):
+    """以数组调用评价函数，函数不支持数组时退化为逐条计算"""
+    try:
+        values = np.asarray(func(union_counts,left_counts,right_counts,N),dtype=np.float64)
+    except (TypeError,ValueError):
+        values = None
+    if values is None or values.shape != union_counts.shape:
+        values = np.vectorize(func,otypes=[np.float64])(union_counts,left_counts,right_counts,N)
+    return values
+
+def find_rules_batch(itemsets,transactions_size,minimum_conf,minimum_lift=None,as_frame=False,stats=None,
+                     closed=False,**evaluation_funcs):
+    """
+    批量生成关联规则：后件按长度逐层生长，每一层将所有项集的候选规则的(count(AB),count(A),count(B))
+    组成数组，以向量掩码筛选置信度，通过的后件合并产生下一层候选后件；最后以掩码筛选提升度，
+    并对整个数组一次性计算各评价指标
+    参数与find_rules相同，自定义评价函数应支持numpy数组输入(Evatn_func中的函数均支持)，不支持时逐条计算
+    as_frame: 为True时返回pandas.DataFrame，否则返回numpy结构化数组
+    stats: 可选的统计字典，记录规则生成的耗时'rules'与rules_tested,rules_emitted
+    closed: itemsets为闭频繁项集时设为True
+    返回列: left,right,support,confidence,lift,[自定义的评价指标]
+    """
+    start = time.perf_counter()
+    index = SupportIndex(itemsets,closed=closed)
+    codec = index.codec
+    N = transactions_size
+    entries = list(index.items())
+    lefts,rights = [],[]
+    union_counts,left_counts,right_counts,conf = [],[],[],[]
+    # 当前层的候选规则: (项集下标,后件)
+    level = [(k,(item,)) for k,(itemset,_) in enumerate(entries) if len(itemset) > 1 for item in sorted(itemset)]
+    while level:
+        level_lefts = [entries[k][0].difference(consequent) for k,consequent in level]
+        level_union = np.asarray([entries[k][1] for k,_ in level],dtype=np.float64)
+        level_left = np.asarray([index.get(left) for left in level_lefts],dtype=np.float64)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            level_conf = Evatn_func.conf(level_union,level_left,None,N)
+        mask = level_conf >= minimum_conf
+        incr(stats,'rules_tested',len(level))
+        passed = defaultdict(list)
+        for i in np.flatnonzero(mask):
+            k,consequent = level[i]
+            passed[k].append(consequent)
+            lefts.append(level_lefts[i])
+            rights.append(frozenset(consequent))
+        union_counts.append(level_union[mask])
+        left_counts.append(level_left[mask])
+        conf.append(level_conf[mask])
+        level = [(k,consequent) for k,consequents in passed.items() if len(consequents[0]) + 1 < len(entries[k][0])\
+                 for consequent in gen_candidates(consequents)[0]]
+    union_counts = np.concatenate(union_counts) if union_counts else np.zeros(0)
+    left_counts = np.concatenate(left_counts) if left_counts else np.zeros(0)
+    conf = np.concatenate(conf) if conf else np.zeros(0)
+    right_counts = np.asarray([index.get(right) for right in rights],dtype=np.float64)
+
+    with np.errstate(divide='ignore',invalid='ignore'):
+        lift = Evatn_func.lift(union_counts,left_counts,right_counts,N)
+        mask = np.ones(len(lift),dtype=bool)
+        if minimum_lift is not None:
+            mask &= lift >= minimum_lift
+        union_counts,left_counts,right_counts = union_counts[mask],left_counts[mask],right_counts[mask]
+        columns = [
+            ('support',Evatn_func.sup(union_counts,left_counts,right_counts,N)),
+            ('confidence',conf[mask]),
+            ('lift',lift[mask])
+        ] + [
+            (name,_evaluate_batch(func,union_counts,left_counts,right_counts,N))\
+                for name,func in evaluation_funcs.items()
+        ]
+    selected = np.flatnonzero(mask)
+    incr(stats,'rules_emitted',len(selected))
+    rules = np.empty(len(selected),dtype=[('left',object),('right',object)] + [(name,np.float64) for name,_ in columns])
+    rules['left'] = [set(codec.decode(lefts[i])) for i in selected]
+    rules['right'] = [set(codec.decode(rights[i])) for i in selected]
+    for name,values in columns:
+        rules[name] = values
+    add_time(stats,'rules',time.perf_counter() - start)
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame(rules)
+    return rules
 
 def find_r_h(itemsets):
     """
     发掘长度>=2的频繁项集的支持度比率r,与h置信度(全置信度)
     itemsets: 频繁项集
     """
-    one_itemsets = []
-    for itemset in itemsets:
-        itemset,sup_count = itemset
-        if len(itemset) == 1:
-            one_itemsets.append((itemset,sup_count))
+    itemsets = list(itemsets)
+    index = SupportIndex(itemsets)
     rh = []
     for itemset in itemsets:
         itemset,sup_count = itemset
         if len(itemset) > 1:
             sups = []
             for item in combinations(itemset,1):
-                sup = find_support_from_itemsets(list(item),one_itemsets)
+                sup = index.support(item)
                 sups.append(sup)
             r = min(sups) / max(sups)
             h = sup_count / max(sups)
             rh.append((itemset,{'r':r,'h':h}))
     return rh
 
-def find_frequent_itemsets(find_func,transactions,minimum_support,**kargs):
+def find_frequent_itemsets(find_func,transactions,minimum_support,cache=None,**kargs):
     """
     通过特定算法发掘频繁项集;
-    minimum_support >= 1且为整数时，代表支持度计数;1.0 >= minimum_support >= 0.0 且为float时代表支持度
-    find_func: 可以为apriori,fp_growth2,fp_growth模块下面的同名函数find_frequent_itemsets
+    minimum_support >= 1且为整数时，代表支持度计数;1.0 >= minimum_support >= 0.0 且为float时代表支持度;
+    fp_growth,fp_growth2以top_k参数挖掘前k个频繁项集时可以为None
+    find_func: 可以为apriori,eclat,fp_growth2,fp_growth模块下面的同名函数find_frequent_itemsets
+    cache: 可选的cache.MiningCache，相同数据与参数的结果从缓存中获取(按支持度降序排列)
     """
-    if minimum_support <= 1 and minimum_support >= 0 and type(minimum_support) == float:
+    if cache is not None:
+        return cache.find_frequent_itemsets(find_func,transactions,minimum_support,**kargs)
+    if minimum_support is not None and 0 <= minimum_support <= 1 and type(minimum_support) == float:
         minimum_support = len(transactions) * minimum_support
     itemsets = find_func(transactions,minimum_support,**kargs)
     return itemsets
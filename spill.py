@@ -0,0 +1,88 @@
+# encoding: utf-8
+"""
+限定内存的fp-growth挖掘：递归查找时，源树与各级条件树同时保存在内存中，稠密数据上这一链条会很深。
+给出memory_limit时，各级仍在内存中的树的总大小超过预算后，当前树所有频繁项的条件模式基(投影数据库)被写入磁盘，
+当前树随即释放，之后逐个读回条件模式基、构建条件树并递归查找(数据库投影方式)，内存不足时以磁盘读写代替。
+fp_growth与fp_growth2的find_frequent_itemsets接受memory_limit参数(字节数)。
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from instrument import incr
+
+class ProjectedDatabases(object):
+    """
+    条件模式基的磁盘存储与内存预算，每个条件模式基以CSR形式(offsets,items,counts)保存为一个.npz文件，
+    读回后即删除；项须为整数id(各算法编码后的项)
+    用法:
+        with ProjectedDatabases(memory_limit) as spill:
+            ...
+    """
+    def __init__(self,memory_limit,directory=None,stats=None):
+        """
+        memory_limit: 内存中的树的总大小预算(字节)
+        directory: 保存条件模式基的目录，默认在第一次写入时创建临时目录，结束时删除
+        stats: 可选的统计字典，记录写入磁盘的条件模式基数spilled_bases与字节数spilled_bytes
+        """
+        self.memory_limit = memory_limit
+        self.directory = directory
+        self.stats = stats
+        self.used = 0 # 递归中仍在内存中的树的总大小
+        self._own_directory = False
+        self._written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc_info):
+        self.close()
+
+    def acquire(self,nbytes):
+        """登记一棵树的大小，返回是否超过预算"""
+        self.used += nbytes
+        return self.used > self.memory_limit
+
+    def release(self,nbytes):
+        """树被释放时减去其大小"""
+        self.used -= nbytes
+
+    def write(self,base):
+        """
+        将条件模式基[(路径上的项,计数),...]写入磁盘，返回文件路径
+        """
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='fp_projected_')
+            self._own_directory = True
+        path = os.path.join(self.directory,'%d.npz' % self._written)
+        self._written += 1
+        offsets = np.zeros(len(base)+1,dtype=np.int64)
+        offsets[1:] = np.cumsum([len(items) for items,_ in base])
+        items = np.asarray([item for items,_ in base for item in items],dtype=np.int64)
+        counts = np.asarray([count for _,count in base],dtype=np.int64)
+        np.savez(path,offsets=offsets,items=items,counts=counts)
+        incr(self.stats,'spilled_bases')
+        incr(self.stats,'spilled_bytes',os.path.getsize(path))
+        return path
+
+    def read(self,path):
+        """读回write写入的条件模式基并删除文件"""
+        with np.load(path) as data:
+            offsets,items,counts = data['offsets'].tolist(),data['items'].tolist(),data['counts'].tolist()
+        os.remove(path)
+        return [(items[offsets[k]:offsets[k+1]],count) for k,count in enumerate(counts)]
+
+    def close(self):
+        """删除自行创建的临时目录"""
+        if self._own_directory:
+            shutil.rmtree(self.directory,ignore_errors=True)
+            self.directory = None
+            self._own_directory = False
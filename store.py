@@ -0,0 +1,255 @@
+# encoding: utf-8
+"""
+已编码数据的二进制存储：一个目录中包含
+    offsets.npy: int64，长度为数据条目数+1
+    items.npy: int32，所有数据条目的项id拼接而成
+    counts.npy: int64，每个项id的出现次数
+    vocab.json: 按id顺序排列的项
+各算法可以通过open_store以numpy.memmap的方式直接打开，不必将数据读入内存，多个进程可以共享同一份页缓存。
+挖掘结果(频繁项集与关联规则)以同样的方式保存：项集以CSR形式保存项id，支持度与各度量各占一列，
+通过open_itemsets/open_rules以memmap方式打开，在多个进程中共享而无需pickle。
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import csv
+import json
+import os
+from array import array
+
+import numpy as np
+
+from codec import ItemCodec,Transactions,encode_transactions
+
+def _write_vocab(path,codec):
+    with open(os.path.join(path,'vocab.json'),'w',encoding='utf-8') as f:
+        json.dump(codec.items,f,ensure_ascii=False)
+    np.save(os.path.join(path,'counts.npy'),np.asarray(codec.counts,dtype=np.int64))
+
+def _read_vocab(path):
+    with open(os.path.join(path,'vocab.json'),encoding='utf-8') as f:
+        items = json.load(f)
+    return ItemCodec(items,np.load(os.path.join(path,'counts.npy')))
+
+def save_transactions(path,transactions):
+    """
+    将数据编码后写入目录path
+    transactions: 类双层python链表或codec.Transactions，项必须能以json保存(str,int,float)
+    """
+    codec,data = encode_transactions(transactions)
+    os.makedirs(path,exist_ok=True)
+    np.save(os.path.join(path,'offsets.npy'),np.asarray(data.offsets,dtype=np.int64))
+    np.save(os.path.join(path,'items.npy'),np.asarray(data.items,dtype=np.int32))
+    _write_vocab(path,codec)
+
+def open_store(path):
+    """
+    以只读memmap方式打开目录path中的数据，返回codec.Transactions，可直接传给各算法的find_frequent_itemsets
+    """
+    offsets = np.load(os.path.join(path,'offsets.npy'),mmap_mode='r')
+    items = np.load(os.path.join(path,'items.npy'),mmap_mode='r')
+    return Transactions(offsets,items,_read_vocab(path))
+
+def read_baskets(inputfile,sep=','):
+    """逐条读取csv/购物篮文本文件，每行为一条数据，空白项被忽略"""
+    with open(inputfile,newline='',encoding='utf-8') as f:
+        for row in csv.reader(f,delimiter=sep):
+            yield [field.strip() for field in row if field.strip()]
+
+def convert_csv(inputfile,path,sep=','):
+    """
+    将csv/购物篮文本文件转换为二进制存储，两次遍历文件：第一次统计项的出现次数，第二次写入项id，
+    内存占用只与项的种类数有关，与文件大小无关
+    inputfile: 输入文件，每行为一条数据，项之间以sep分隔
+    path: 输出目录
+    返回: open_store(path)
+    """
+    counts = {}
+    length,total = 0,0
+    for basket in read_baskets(inputfile,sep):
+        for item in basket:
+            counts[item] = counts.get(item,0) + 1
+        length += 1
+        total += len(basket)
+    codec = ItemCodec.from_counts(list(counts),list(counts.values()))
+
+    os.makedirs(path,exist_ok=True)
+    offsets = np.lib.format.open_memmap(os.path.join(path,'offsets.npy'),mode='w+',dtype=np.int64,shape=(length+1,))
+    items = np.lib.format.open_memmap(os.path.join(path,'items.npy'),mode='w+',dtype=np.int32,shape=(total,))
+    offsets[0] = 0
+    position = 0
+    for row_idx,basket in enumerate(read_baskets(inputfile,sep)):
+        ids = codec.encode(basket)
+        items[position:position+len(ids)] = ids
+        position += len(ids)
+        offsets[row_idx+1] = position
+    offsets.flush()
+    items.flush()
+    del offsets,items
+    _write_vocab(path,codec)
+    return open_store(path)
+
+class _CSRWriter(object):
+    """逐个追加项集，以共享的项编号(vocab)编码为CSR形式的offsets与items数组"""
+    def __init__(self,vocab):
+        self.vocab = vocab # 项 -> id，按首次出现的先后编号
+        self.offsets = array('q',[0])
+        self.ids = array('i')
+
+    def append(self,itemset):
+        vocab,ids = self.vocab,self.ids
+        for item in itemset:
+            idx = vocab.get(item)
+            if idx is None:
+                idx = vocab[item] = len(vocab)
+            ids.append(idx)
+        self.offsets.append(len(ids))
+
+    def save(self,path,name):
+        np.save(os.path.join(path,name+'_offsets.npy'),np.frombuffer(self.offsets,dtype=np.int64))
+        np.save(os.path.join(path,name+'_items.npy'),np.frombuffer(self.ids,dtype=np.intc).astype(np.int32))
+
+def _open_csr(path,name):
+    return (np.load(os.path.join(path,name+'_offsets.npy'),mmap_mode='r'),
+            np.load(os.path.join(path,name+'_items.npy'),mmap_mode='r'))
+
+def _write_result_meta(path,kind,vocab,columns):
+    with open(os.path.join(path,'vocab.json'),'w',encoding='utf-8') as f:
+        json.dump(list(vocab),f,ensure_ascii=False)
+    with open(os.path.join(path,'meta.json'),'w',encoding='utf-8') as f:
+        json.dump({'kind':kind,'columns':columns},f)
+
+def _read_result_meta(path,kind):
+    """返回(meta,ItemCodec)"""
+    with open(os.path.join(path,'meta.json'),encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta['kind'] != kind:
+        raise ValueError('%s中保存的是%s，不是%s' % (path,meta['kind'],kind))
+    with open(os.path.join(path,'vocab.json'),encoding='utf-8') as f:
+        return meta,ItemCodec(json.load(f))
+
+def save_itemsets(path,itemsets):
+    """
+    将频繁项集结果[(项集,支持度计数),...]逐个写入目录path：
+        itemsets_offsets.npy,itemsets_items.npy: 项集的项id(CSR形式)
+        support.npy: 支持度计数(均为整数时为int64，否则为float64，如mini-apriori的结果)
+        vocab.json: 按id顺序排列的项
+        meta.json: 结果类型与度量列名
+    项必须能以json保存(str,int,float)
+    """
+    writer = _CSRWriter({})
+    supports = array('d')
+    for itemset,sup in itemsets:
+        writer.append(itemset)
+        supports.append(sup)
+    supports = np.frombuffer(supports,dtype=np.float64)
+    if np.array_equal(supports,np.round(supports)):
+        supports = supports.astype(np.int64)
+    os.makedirs(path,exist_ok=True)
+    writer.save(path,'itemsets')
+    np.save(os.path.join(path,'support.npy'),supports)
+    _write_result_meta(path,'itemsets',writer.vocab,['support'])
+
+def save_rules(path,rules,names=None):
+    """
+    将关联规则逐条写入目录path：
+        left_offsets.npy,left_items.npy,right_offsets.npy,right_items.npy: 前件与后件的项id(CSR形式)
+        support.npy,confidence.npy,lift.npy及每个自定义评价指标一列: float64
+        vocab.json,meta.json
+    rules: rule.find_rules的结果(可以是生成器，不在内存中保存规则本身)或rule.find_rules_batch返回的结构化数组
+    names: 度量列名，默认为support,confidence,lift加上结构化数组中的其它列；
+           find_rules使用了自定义评价指标时应给出全部列名，如['support','confidence','lift','corr']
+    """
+    if isinstance(rules,np.ndarray) and rules.dtype.names:
+        names = list(rules.dtype.names[2:]) if names is None else list(names)
+        rules = (tuple([rule['left'],rule['right']] + [rule[name] for name in names]) for rule in rules)
+    names = ['support','confidence','lift'] if names is None else list(names)
+    vocab = {}
+    lefts,rights = _CSRWriter(vocab),_CSRWriter(vocab)
+    columns = [array('d') for _ in names]
+    for rule in rules:
+        lefts.append(rule[0])
+        rights.append(rule[1])
+        for column,value in zip(columns,rule[2:]):
+            column.append(value)
+    os.makedirs(path,exist_ok=True)
+    lefts.save(path,'left')
+    rights.save(path,'right')
+    for name,column in zip(names,columns):
+        np.save(os.path.join(path,name+'.npy'),np.frombuffer(column,dtype=np.float64))
+    _write_result_meta(path,'rules',vocab,names)
+
+class ItemsetTable(object):
+    """
+    以memmap方式打开的频繁项集结果
+    offsets,items: 项集的项id(CSR形式)，第i个项集为items[offsets[i]:offsets[i+1]]
+    support: 支持度计数数组
+    codec: ItemCodec
+    """
+    def __init__(self,offsets,items,support,codec):
+        self.offsets = offsets
+        self.items = items
+        self.support = support
+        self.codec = codec
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def ids(self,idx):
+        """第idx个项集的项id数组"""
+        return self.items[self.offsets[idx]:self.offsets[idx+1]]
+
+    def __getitem__(self,idx):
+        """返回第idx个(项集,支持度计数)"""
+        return self.codec.decode(self.ids(idx).tolist()),self.support[idx].item()
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+class RuleTable(object):
+    """
+    以memmap方式打开的关联规则
+    left_offsets,left_items,right_offsets,right_items: 前件与后件的项id(CSR形式)
+    columns: {度量名:数组}，按保存时的顺序
+    codec: ItemCodec
+    """
+    def __init__(self,left,right,columns,codec):
+        self.left_offsets,self.left_items = left
+        self.right_offsets,self.right_items = right
+        self.columns = columns
+        self.codec = codec
+
+    def __len__(self):
+        return len(self.left_offsets) - 1
+
+    def left_ids(self,idx):
+        return self.left_items[self.left_offsets[idx]:self.left_offsets[idx+1]]
+
+    def right_ids(self,idx):
+        return self.right_items[self.right_offsets[idx]:self.right_offsets[idx+1]]
+
+    def __getitem__(self,idx):
+        """返回与rule.find_rules相同形式的tuple: (前件,后件,support,confidence,lift,[自定义的评价指标])"""
+        decode = self.codec.decode
+        return tuple([set(decode(self.left_ids(idx).tolist())),set(decode(self.right_ids(idx).tolist()))]\
+                     + [values[idx].item() for values in self.columns.values()])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+def open_itemsets(path):
+    """以只读memmap方式打开save_itemsets保存的结果，返回ItemsetTable"""
+    meta,codec = _read_result_meta(path,'itemsets')
+    offsets,items = _open_csr(path,'itemsets')
+    return ItemsetTable(offsets,items,np.load(os.path.join(path,'support.npy'),mmap_mode='r'),codec)
+
+def open_rules(path):
+    """以只读memmap方式打开save_rules保存的规则，返回RuleTable"""
+    meta,codec = _read_result_meta(path,'rules')
+    columns = dict((name,np.load(os.path.join(path,name+'.npy'),mmap_mode='r')) for name in meta['columns'])
+    return RuleTable(_open_csr(path,'left'),_open_csr(path,'right'),columns,codec)
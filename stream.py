@@ -0,0 +1,105 @@
+# encoding: utf-8
+"""
+流式读取数据：数据源可以重复打开(文件路径或返回数据块的函数)，每次按固定大小的块读取，不在内存中保存整个数据链表。
+第一次遍历统计项的出现次数得到ItemCodec，第二次遍历时逐块编码并直接插入fp树，内存占用由fp树决定而与原始数据大小无关。
+用法:
+    source = TransactionSource('baskets.csv',chunk_size=10000)
+    itemsets = fp_growth2.find_frequent_itemsets(source,minimum_support)
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import os
+from itertools import islice
+
+from codec import ItemCodec,encode_transactions
+from instrument import phase
+from store import read_baskets
+
+class TransactionSource(object):
+    """
+    可重复打开的数据源，按块读取
+    """
+    def __init__(self,source,chunk_size=10000,sep=','):
+        """
+        source: csv/购物篮文本文件的路径(每行为一条数据，项之间以sep分隔)，
+                或无参数的函数，每次调用返回一个新的数据块迭代器，每个数据块为若干条数据组成的链表
+        chunk_size: 读取文件时每个数据块的数据条目数
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self.sep = sep
+        self.codec = None # 第一次遍历后得到的ItemCodec
+        self.length = None # 数据条目数
+
+    def chunks(self):
+        """重新打开数据源，逐块返回数据"""
+        if callable(self.source):
+            yield from self.source()
+            return
+        if not isinstance(self.source,(str,bytes,os.PathLike)):
+            raise TypeError('source必须为文件路径或返回数据块迭代器的函数')
+        baskets = read_baskets(self.source,self.sep)
+        while True:
+            chunk = list(islice(baskets,self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def __iter__(self):
+        """逐条返回数据，每次迭代重新读取数据源"""
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __len__(self):
+        if self.length is None:
+            self.count_items()
+        return self.length
+
+    def count_items(self,stats=None):
+        """
+        第一次遍历：统计每个项的出现次数，返回按出现次数编码的ItemCodec，结果缓存在codec与length中
+        stats: 可选的统计字典(见instrument)，记录count阶段的耗时
+        """
+        if self.codec is not None:
+            return self.codec
+        with phase(stats,'count'):
+            counts = {}
+            length = 0
+            for chunk in self.chunks():
+                for transaction in chunk:
+                    for item in transaction:
+                        counts[item] = counts.get(item,0) + 1
+                length += len(chunk)
+            self.codec = ItemCodec.from_counts(list(counts),list(counts.values()))
+            self.length = length
+        return self.codec
+
+class EncodedSource(object):
+    """
+    TransactionSource的编码视图：每次迭代重新读取数据源，逐块编码后逐条返回项id链表
+    """
+    def __init__(self,source,codec):
+        self.source = source
+        self.codec = codec
+
+    def __len__(self):
+        return len(self.source)
+
+    def __iter__(self):
+        encode = self.codec.encode
+        for chunk in self.source.chunks():
+            for transaction in chunk:
+                yield encode(transaction)
+
+def encode_source(transactions,stats=None):
+    """
+    TransactionSource只遍历一次统计项的出现次数，返回(ItemCodec,EncodedSource)，不保存数据本身；
+    其它数据交给codec.encode_transactions，返回(ItemCodec,codec.Transactions)
+    """
+    if isinstance(transactions,TransactionSource):
+        return transactions.count_items(stats),EncodedSource(transactions,transactions.codec)
+    return encode_transactions(transactions,stats)
@@ -0,0 +1,58 @@
+# encoding: utf-8
+"""
+top-k频繁项集挖掘的结果收集：不需要事先给出支持度，支持度阈值随着已找到的前k个项集的支持度动态上升，
+fp_growth与fp_growth2在递归查找时以当前阈值剪枝与构建条件树
+
+"""
+
+# original author information
+__copyright__ = 'Copyright © 2022 ERSSLE'
+__license__ = 'MIT License'
+
+import heapq
+
+class TopK(object):
+    """
+    收集支持度计数最大的k个频繁项集，支持度与第k个项集相同的项集一并保留，
+    因此结果与以第k个项集的支持度计数作为minimum_support挖掘(并按min_length筛选)的结果相同
+    """
+    def __init__(self,k,minimum_support=None,min_length=1):
+        """
+        k: 需要的项集数
+        minimum_support: 可选的支持度计数下限，阈值不会低于它
+        min_length: 项集的最小长度，更短的项集仍参与查找但不计入结果
+        """
+        if k < 1:
+            raise ValueError('top_k必须为正整数')
+        self.k = k
+        self.min_length = min_length
+        self.threshold = 1 if minimum_support is None else max(minimum_support,1) # 当前支持度计数阈值，只增不减
+        self._heap = [] # 已找到的前k个支持度计数(小顶堆)
+        self._found = []
+
+    def bound(self,counts):
+        """
+        根据单个项的支持度计数提高初始阈值：min_length<=1时单个项本身即为结果项集，第k大的计数是阈值的下界
+        counts: 所有项的支持度计数
+        """
+        if self.min_length <= 1 and len(counts) >= self.k:
+            kth = sorted(counts,reverse=True)[self.k-1]
+            self.threshold = max(self.threshold,kth)
+
+    def push(self,itemset,support):
+        """记录一个支持度计数不低于当前阈值的频繁项集，堆满后阈值提高到第k大的支持度计数"""
+        if len(itemset) < self.min_length or support < self.threshold:
+            return
+        self._found.append((itemset,support))
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap,support)
+        elif support > self._heap[0]:
+            heapq.heapreplace(self._heap,support)
+        if len(self._heap) == self.k and self._heap[0] > self.threshold:
+            self.threshold = self._heap[0]
+
+    def result(self):
+        """返回[(项集,支持度计数),...]，按支持度计数降序排列"""
+        found = [fi for fi in self._found if fi[1] >= self.threshold]
+        found.sort(key=lambda fi: -fi[1])
+        return found